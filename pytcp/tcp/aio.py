@@ -0,0 +1,58 @@
+import asyncio
+from collections import deque
+
+from .storage import Buffer
+from .stream import Stream
+
+
+class AsyncStream(Stream):
+    __readers: deque[asyncio.Future]
+    __writers: deque[asyncio.Future]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__readers = deque()
+        self.__writers = deque()
+
+    @staticmethod
+    def __wake(waiters: deque[asyncio.Future]):
+        while len(waiters) > 0:
+            fut = waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+
+    @staticmethod
+    async def __wait(waiters: deque[asyncio.Future]):
+        fut = asyncio.get_running_loop().create_future()
+        waiters.append(fut)
+        await fut
+
+    def __check_error(self):
+        if self.has_error():
+            raise ConnectionError('stream has error')
+
+    def _on_push(self, n: int):
+        self.__wake(self.__readers)
+
+    def _on_pop(self, n: int):
+        self.__wake(self.__writers)
+
+    async def write(self, data: Buffer):
+        view = memoryview(data)
+        while True:
+            self.__check_error()
+            view = view[self.push(view):]
+            if len(view) == 0:
+                return
+            await self.__wait(self.__writers)
+
+    async def read(self, n: int = -1) -> bytes:
+        while self.bytes_buffered() == 0 and not self.is_closed():
+            self.__check_error()
+            await self.__wait(self.__readers)
+        return self.pop(n)
+
+    async def drain(self):
+        while self.bytes_buffered() > 0:
+            self.__check_error()
+            await self.__wait(self.__writers)
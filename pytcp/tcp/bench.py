@@ -0,0 +1,515 @@
+import argparse
+import json
+import platform
+import random
+import threading
+import time
+import timeit
+from typing import Callable, Iterator, Union
+
+from .messages import ReceiverMessage, SenderMessage
+from .reassembler import Engine, Reassembler, SegmentEngine, WindowEngine
+from .receiver import Receiver
+from .sender import Sender
+from .spsc import SPSCStream
+from .storage import BytesStorage, ChunkStorage, RingStorage, Storage
+from .stream import Stream
+from .stress import stress_test
+from .wire import HEADER_LEN, decode, decode_batch, encode_batch, encode_into
+from .wrap32 import Wrap32
+
+Result = dict[str, Union[str, int, float]]
+
+Bench = Callable[[argparse.Namespace], Iterator[Result]]
+
+BENCHES: dict[str, Bench] = {}
+
+STORAGES: dict[str, Callable[[int], Storage]] = {
+    'bytes': BytesStorage,
+    'ring': RingStorage,
+    'chunk': ChunkStorage,
+}
+
+ENGINES: dict[str, Callable[[int], Engine]] = {
+    'segment': SegmentEngine,
+    'window': WindowEngine,
+}
+
+
+def bench(func: Bench) -> Bench:
+    BENCHES[func.__name__] = func
+    return func
+
+
+def gbps(nbytes: int, seconds: float) -> float:
+    return 8 * nbytes / seconds / 1e9
+
+
+def stream_fill_drain(storage: Callable[[int], Storage], data: bytes, cap: int,
+                      write_size: int) -> float:
+    view = memoryview(data)
+    stream = Stream(cap, storage=storage)
+    output = bytearray()
+
+    start = time.perf_counter()
+    pos = 0
+    while pos < len(data):
+        while pos < len(data) and stream.cap() > 0:
+            to_push = min(write_size, stream.cap())
+            stream.push(view[pos:pos + to_push])
+            pos += to_push
+        while stream.bytes_buffered() > 0:
+            output += stream.pop(write_size)
+    stop = time.perf_counter()
+
+    if output != data:
+        raise RuntimeError('Mismatch between data written and read')
+    return stop - start
+
+
+def byte_stream_speed_test(input_len: int, capacity: int, random_seed: int,
+                           write_size: int, read_size: int,
+                           storage: Callable[[int], Storage]) -> float:
+    data = random.Random(random_seed).randbytes(input_len)
+    split_data = [
+        data[i:i + write_size] for i in range(0, len(data), write_size)
+    ]
+    split_data.reverse()
+
+    stream = Stream(capacity, storage=storage)
+    output = bytearray()
+
+    start = time.perf_counter()
+    while not stream.is_finished():
+        if len(split_data) == 0:
+            if not stream.is_closed():
+                stream.close()
+        elif len(split_data[-1]) <= stream.cap():
+            stream.push(split_data.pop())
+
+        if stream.bytes_buffered() > 0:
+            peeked = stream.peek_view(read_size)
+            if len(peeked) == 0:
+                raise RuntimeError('Stream.peek_view() returned empty view')
+            output += peeked
+            stream.skip(len(peeked))
+    stop = time.perf_counter()
+
+    if output != data:
+        raise RuntimeError('Mismatch between data written and read')
+    return stop - start
+
+
+def reassembler_speed_test(num_chunks: int, capacity: int, random_seed: int,
+                           engine: Callable[[int], Engine]) -> float:
+    data = random.Random(random_seed).randbytes(num_chunks * capacity)
+    split_data = []
+    for i in range(0, len(data), capacity):
+        for j in (i + 2, i, i + 1):
+            split_data.append((j, data[j:j + capacity * 2], j + capacity * 2
+                               >= len(data)))
+
+    reassembler = Reassembler(capacity, engine=engine)
+    output = bytearray()
+
+    start = time.perf_counter()
+    for idx, buf, eof in split_data:
+        reassembler.insert(idx, buf, eof)
+        while reassembler.bytes_buffered() > 0:
+            output += reassembler.peek_view()
+            reassembler.skip(len(output) - reassembler.bytes_popped())
+    stop = time.perf_counter()
+
+    if not reassembler.is_finished():
+        raise RuntimeError('Reassembler did not close Stream when finished')
+    if output != data:
+        raise RuntimeError('Mismatch between data written and read')
+    return stop - start
+
+
+@bench
+def byte_stream(args: argparse.Namespace) -> Iterator[Result]:
+    for name in args.storage:
+        seed = args.seed if args.seed is not None else 789
+        seconds = byte_stream_speed_test(args.input_len, args.capacity, seed,
+                                         args.write_size, args.read_size,
+                                         STORAGES[name])
+        yield {
+            'storage': name,
+            'input_len': args.input_len,
+            'capacity': args.capacity,
+            'write_size': args.write_size,
+            'read_size': args.read_size,
+            'seed': seed,
+            'seconds': seconds,
+            'gbps': gbps(args.input_len, seconds),
+        }
+
+
+@bench
+def reassembler(args: argparse.Namespace) -> Iterator[Result]:
+    seed = args.seed if args.seed is not None else 1370
+    for name in args.engine:
+        seconds = reassembler_speed_test(args.num_chunks, args.segment_size,
+                                         seed, ENGINES[name])
+        yield {
+            'engine': name,
+            'num_chunks': args.num_chunks,
+            'capacity': args.segment_size,
+            'seed': seed,
+            'seconds': seconds,
+            'gbps': gbps(args.num_chunks * args.segment_size, seconds),
+        }
+
+
+def single_loss_test(data: bytes, window: int, mss: int,
+                     engine: Callable[[int], Engine]) -> float:
+    reassembler = Reassembler(window, engine=engine)
+    output = bytearray()
+
+    start = time.perf_counter()
+    for base in range(0, len(data), window):
+        for i in range(base + mss, base + window, mss):
+            reassembler.insert(i, data[i:i + mss])
+        reassembler.insert(base, data[base:base + mss])
+        output += reassembler.pop()
+    stop = time.perf_counter()
+
+    if output != data:
+        raise RuntimeError('Mismatch between data written and read')
+    return stop - start
+
+
+@bench
+def single_loss(args: argparse.Namespace) -> Iterator[Result]:
+    mss = 1000
+    for name in args.engine:
+        for segments in (16, 256, 4096):
+            window = segments * mss
+            data = random.Random(1370).randbytes(window * (4096 // segments))
+            seconds = single_loss_test(data, window, mss, ENGINES[name])
+            yield {
+                'engine': name,
+                'window': window,
+                'mss': mss,
+                'gbps': gbps(len(data), seconds),
+            }
+
+
+@bench
+def stream_storage(args: argparse.Namespace) -> Iterator[Result]:
+    data = random.Random(789).randbytes(1 << 22)
+    for storage in (BytesStorage, RingStorage, ChunkStorage):
+        for cap in (4096, 65536, 262144):
+            for write_size in (100, 1500, 16000):
+                seconds = stream_fill_drain(storage, data, cap, write_size)
+                yield {
+                    'storage': storage.__name__,
+                    'cap': cap,
+                    'write_size': write_size,
+                    'gbps': gbps(len(data), seconds),
+                }
+
+
+def spsc_two_threads(data: bytes, cap: int, write_size: int,
+                     read_size: int) -> float:
+    view = memoryview(data)
+    stream = SPSCStream(cap)
+    output = bytearray()
+
+    def writer():
+        for i in range(0, len(view), write_size):
+            stream.write(view[i:i + write_size])
+        stream.close()
+
+    thread = threading.Thread(target=writer)
+    buf = bytearray(read_size)
+    start = time.perf_counter()
+    thread.start()
+    while not stream.is_finished():
+        n = stream.read_into(buf)
+        output += memoryview(buf)[:n]
+    thread.join()
+    stop = time.perf_counter()
+
+    if output != data:
+        raise RuntimeError('Mismatch between data written and read')
+    return stop - start
+
+
+@bench
+def spsc_threads(args: argparse.Namespace) -> Iterator[Result]:
+    data = random.Random(789).randbytes(1 << 24)
+    for cap in (4096, 65536, 1 << 20):
+        for write_size in (1500, 16000):
+            seconds = spsc_two_threads(data, cap, write_size, 16384)
+            yield {
+                'cap': cap,
+                'write_size': write_size,
+                'read_size': 16384,
+                'gbps': gbps(len(data), seconds),
+            }
+
+
+@bench
+def reassembler_stress(args: argparse.Namespace) -> Iterator[Result]:
+    seed = args.seed if args.seed is not None else 1370
+    engines = {name: ENGINES[name] for name in args.engine}
+    for capacity in (17, 1500, 65536):
+        input_len = max(16 * capacity, 1 << 16)
+        totals = stress_test(engines, input_len, capacity, seed, args.inserts)
+        for name, (inserts, nbytes, seconds) in totals.items():
+            yield {
+                'engine': name,
+                'capacity': capacity,
+                'inserts': inserts,
+                'seed': seed,
+                'inserts_per_sec': round(inserts / seconds),
+                'seconds': seconds,
+                'gbps': gbps(nbytes, seconds),
+            }
+
+
+class LegacyWrap32:
+    # Wrap32 before it grew __slots__, kept as the wrap32 bench baseline.
+    raw: int
+
+    MASK32 = 0xffffffff
+    MASK64_HIGH32 = 0xffffffff00000000
+    ATOMIC_HIGH32 = 0x100000000
+
+    def __init__(self, raw: int):
+        self.raw = raw & self.MASK32
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LegacyWrap32):
+            return self.raw == other.raw
+        return self.raw == LegacyWrap32(other).raw
+
+    def __add__(self, other):
+        if isinstance(other, LegacyWrap32):
+            return LegacyWrap32(self.raw + other.raw)
+        return LegacyWrap32(self.raw + other)
+
+    def wrap(self, n: int) -> 'LegacyWrap32':
+        return LegacyWrap32(self.raw + n)
+
+    def unwrap(self, w: 'LegacyWrap32', checkpoint: int) -> int:
+        n = (w.raw - self.raw) & self.MASK32
+        cl = checkpoint & self.MASK32
+        ch = checkpoint & self.MASK64_HIGH32
+        if n == cl:
+            return ch + n
+        if (n - cl) & self.MASK32 < (cl - n) & self.MASK32:
+            return ch + n if n > cl else ch + n + self.ATOMIC_HIGH32
+        else:
+            return ch + n if n < cl else \
+                (n if ch == 0 else ch + n - self.ATOMIC_HIGH32)
+
+
+def wrap32_ops(cls: type) -> dict[str, Callable[[], object]]:
+    isn, w = cls(0xfffffff0), cls(0x10)
+    checkpoint = (5 << 32) + 0x20
+    return {
+        'new': lambda: cls(0x12345678),
+        'wrap': lambda: isn.wrap(checkpoint),
+        'add': lambda: w + 1,
+        'eq': lambda: isn == w,
+        'eq_int': lambda: isn == 0x10,
+        'unwrap': lambda: isn.unwrap(w, checkpoint),
+    }
+
+
+@bench
+def wrap32(args: argparse.Namespace) -> Iterator[Result]:
+    calls = 1000000
+    ops = {'legacy': wrap32_ops(LegacyWrap32), 'slots': wrap32_ops(Wrap32)}
+    isn_raw, raw, checkpoint = 0xfffffff0, 0x10, (5 << 32) + 0x20
+    ops['slots']['unwrap_raw'] = \
+        lambda: Wrap32.unwrap_raw(isn_raw, raw, checkpoint)
+    for impl, funcs in ops.items():
+        for op, func in funcs.items():
+            seconds = min(timeit.repeat(func, number=calls, repeat=3))
+            yield {
+                'impl': impl,
+                'op': op,
+                'calls': calls,
+                'seconds': seconds,
+                'ns_per_call': seconds / calls * 1e9,
+            }
+
+
+def sender_receiver_test(data: bytes, mss: int,
+                         reuse_messages: bool) -> tuple[int, float]:
+    view = memoryview(data)
+    sender = Sender(1 << 16, isn=0, mss=mss, reuse_messages=reuse_messages)
+    receiver = Receiver(1 << 16)
+    output = bytearray()
+    messages = 0
+
+    start = time.perf_counter()
+    pos = 0
+    while not receiver.is_finished():
+        if pos < len(data):
+            pos += sender.push(view[pos:pos + sender.cap()])
+        elif not sender.is_closed():
+            sender.close()
+        sender.fill()
+        msg = sender.optional_sender_message()
+        while msg is not None:
+            receiver.receive_sender_message(msg)
+            messages += 1
+            msg = sender.optional_sender_message()
+        output += receiver.pop()
+        sender.receive_receiver_message(receiver.receiver_message())
+        messages += 1
+    stop = time.perf_counter()
+
+    if output != data:
+        raise RuntimeError('Mismatch between data sent and received')
+    return messages, stop - start
+
+
+@bench
+def messages(args: argparse.Namespace) -> Iterator[Result]:
+    data = random.Random(789).randbytes(1 << 22)
+    for mss in (100, 1000):
+        for reuse_messages in (False, True):
+            count, seconds = sender_receiver_test(data, mss, reuse_messages)
+            yield {
+                'mss': mss,
+                'reuse_messages': reuse_messages,
+                'messages': count,
+                'seconds': seconds,
+                'msgs_per_sec': count / seconds,
+            }
+
+
+def wire_codec_test(smsgs: list[SenderMessage], rmsg: ReceiverMessage,
+                    rounds: int, batch: bool) -> float:
+    buf = bytearray(sum(HEADER_LEN + len(m.payload) for m in smsgs))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if batch:
+            buf, offsets = encode_batch(smsgs, rmsg, buf)
+            decoded = decode_batch(buf, offsets)
+        else:
+            decoded = []
+            for smsg in smsgs:
+                n = encode_into(buf, 0, smsg, rmsg)
+                decoded.append(decode(buf, 0, n))
+    stop = time.perf_counter()
+
+    if len(decoded) != len(smsgs):
+        raise RuntimeError('Mismatch between messages encoded and decoded')
+    return stop - start
+
+
+@bench
+def wire(args: argparse.Namespace) -> Iterator[Result]:
+    rd = random.Random(789)
+    rmsg = ReceiverMessage(Wrap32(1), 0xffff)
+    for size in (0, 1000):
+        smsgs = [
+            SenderMessage(Wrap32(rd.getrandbits(32)), False, False,
+                          rd.randbytes(size)) for _ in range(64)
+        ]
+        for batch in (False, True):
+            seconds = wire_codec_test(smsgs, rmsg, 2000, batch)
+            yield {
+                'payload': size,
+                'batch': batch,
+                'messages': 2000 * len(smsgs),
+                'seconds': seconds,
+                'msgs_per_sec': 2000 * len(smsgs) / seconds,
+            }
+
+
+def format_result(name: str, result: Result) -> str:
+    params = ', '.join(f'{k}={v}' for k, v in result.items()
+                       if k not in ('seconds', 'gbps', 'ns_per_call',
+                                    'msgs_per_sec'))
+    if 'ns_per_call' in result:
+        return f'{name}: {params} took {result["ns_per_call"]:.1f} ns/call'
+    if 'msgs_per_sec' in result:
+        return f'{name}: {params} reached {result["msgs_per_sec"]:.0f} msgs/s'
+    return f'{name}: {params} reached {result["gbps"]:.2f} Gbit/s'
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m tcp.bench')
+    parser.add_argument('names', nargs='*', metavar='name')
+    parser.add_argument('--json',
+                        action='store_true',
+                        help='print all results as one JSON document')
+    parser.add_argument('--seed', type=int, help='random seed')
+    parser.add_argument('--input-len',
+                        type=int,
+                        default=10000000,
+                        help='byte_stream: bytes written')
+    parser.add_argument('--capacity',
+                        type=int,
+                        default=32768,
+                        help='byte_stream: stream capacity')
+    parser.add_argument('--write-size',
+                        type=int,
+                        default=1500,
+                        help='byte_stream: bytes per push')
+    parser.add_argument('--read-size',
+                        type=int,
+                        default=128,
+                        help='byte_stream: bytes per peek/pop')
+    parser.add_argument('--storage',
+                        nargs='+',
+                        choices=list(STORAGES),
+                        default=list(STORAGES),
+                        help='byte_stream: storage engines')
+    parser.add_argument('--num-chunks',
+                        type=int,
+                        default=10000,
+                        help='reassembler: number of chunks')
+    parser.add_argument('--segment-size',
+                        type=int,
+                        default=1500,
+                        help='reassembler: capacity and chunk size')
+    parser.add_argument('--engine',
+                        nargs='+',
+                        choices=list(ENGINES),
+                        default=list(ENGINES),
+                        help='reassembler: reassembly engines')
+    parser.add_argument('--inserts',
+                        type=int,
+                        default=200000,
+                        help='reassembler_stress: inserts per capacity')
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHES:
+            parser.error(f'unknown benchmark {name!r}, '
+                         f'choose from {", ".join(BENCHES)}')
+
+    results = []
+    for name in args.names or BENCHES:
+        for result in BENCHES[name](args):
+            if args.json:
+                results.append({'bench': name, **result})
+            else:
+                print(format_result(name, result), flush=True)
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    'python':
+                    platform.python_implementation() + ' ' +
+                    platform.python_version(),
+                    'time':
+                    time.time(),
+                    'results':
+                    results,
+                },
+                indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,3 +2,4 @@ STREAM_CAP = 64000
 SENDER_IRTO = 1000
 SENDER_MSS = 1000
 MAX_RETX_ATTEMPTS = 8
+SACK_MAX_BLOCKS = 4
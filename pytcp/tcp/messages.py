@@ -1,18 +1,21 @@
 from dataclasses import dataclass
 from typing import Optional
 
+from .storage import Buffer
 from .wrap32 import Wrap32
 
 
-@dataclass
+# Not frozen: a Sender with reuse_messages refills one instance.
+@dataclass(slots=True)
 class SenderMessage:
     seqno: Wrap32
     syn: bool
     fin: bool
-    payload: bytes
+    payload: Buffer
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ReceiverMessage:
     ackno: Optional[Wrap32]
     winsize: int
+    sack: tuple[tuple[Wrap32, Wrap32], ...] = ()
@@ -0,0 +1,47 @@
+import io
+from typing import Optional
+
+from .storage import Buffer
+from .stream import Stream
+
+
+class StreamReader(io.RawIOBase):
+    __stream: Stream
+
+    def __init__(self, stream: Stream):
+        super().__init__()
+        self.__stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf: Buffer) -> Optional[int]:
+        n = self.__stream.pop_into(buf)
+        if n == 0 and len(buf) > 0 and not self.__stream.is_finished():
+            return None
+        return n
+
+
+class StreamWriter(io.RawIOBase):
+    __stream: Stream
+
+    def __init__(self, stream: Stream):
+        super().__init__()
+        self.__stream = stream
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, buf: Buffer) -> Optional[int]:
+        view = memoryview(buf).cast('B')[:self.__stream.cap()]
+        if len(view) == 0:
+            return 0 if len(buf) == 0 else None
+        # The caller may reuse buf once we return.
+        if self.__stream.borrows_buffers():
+            return self.__stream.push(view.tobytes())
+        return self.__stream.push(view)
+
+    def close(self):
+        if not self.closed:
+            self.__stream.close()
+        super().close()
@@ -1,7 +1,12 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
 from collections import deque
 from dataclasses import dataclass
-from typing import Optional
+from operator import itemgetter
+from typing import Callable, Iterable, Optional
 
+from .defaults import SACK_MAX_BLOCKS
+from .storage import Buffer
 from .stream import Stream
 
 
@@ -9,7 +14,7 @@ from .stream import Stream
 class _Segment:
     first: int
     last: int
-    data: bytes
+    data: Buffer
     eof: bool
 
     def narrow(self, min_idx: int, max_idx: int) -> Optional['_Segment']:
@@ -17,66 +22,477 @@ class _Segment:
             return None
         seg = _Segment(self.first, self.last, self.data, self.eof)
         if seg.last > max_idx:
-            seg.data = seg.data[:max_idx - seg.first]
+            seg.data = memoryview(seg.data)[:max_idx - seg.first]
             seg.last = max_idx
         if seg.first < min_idx:
-            seg.data = seg.data[min_idx - seg.first:]
+            seg.data = memoryview(seg.data)[min_idx - seg.first:]
             seg.first = min_idx
         return seg
 
 
+def _pin(data: Buffer) -> memoryview:
+    # Views are only kept into immutable bytes: a caller reusing a bytearray
+    # or a receive buffer would overwrite pending data, and a kept view
+    # would stop it from resizing its buffer.
+    view = memoryview(data)
+    return view if isinstance(view.obj, bytes) else memoryview(bytes(view))
+
+
+def _split_tail(pieces: deque[memoryview], n: int) -> deque[memoryview]:
+    # Moves the last n bytes of pieces into a new deque.
+    tail: deque[memoryview] = deque()
+    while n > 0:
+        piece = pieces.pop()
+        if len(piece) > n:
+            pieces.append(piece[:len(piece) - n])
+            piece = piece[len(piece) - n:]
+        tail.appendleft(piece)
+        n -= len(piece)
+    return tail
+
+
+def _drop_head(pieces: deque[memoryview], n: int):
+    while n > 0:
+        piece = pieces.popleft()
+        if len(piece) > n:
+            pieces.appendleft(piece[n:])
+        n -= len(piece)
+
+
+class Engine(ABC):
+    # True if flush() returns views into a buffer the engine reuses, which a
+    # storage that keeps buffers by reference must copy.
+    volatile_views: bool = False
+
+    @abstractmethod
+    def store(self, first: int, data: Buffer):
+        ...
+
+    def store_many(self, segs: Iterable[tuple[int, Buffer]]):
+        for first, data in segs:
+            self.store(first, data)
+
+    @abstractmethod
+    def flush(self, idx: int) -> list[Buffer]:
+        ...
+
+    @abstractmethod
+    def prune(self) -> int:
+        ...
+
+    @abstractmethod
+    def discard_from(self, idx: int):
+        ...
+
+    @abstractmethod
+    def fragment_at(self, idx: int) -> Optional[tuple[int, int]]:
+        ...
+
+    @abstractmethod
+    def fragments(self) -> list[tuple[int, int]]:
+        ...
+
+    @abstractmethod
+    def bytes_pending(self) -> int:
+        ...
+
+    @abstractmethod
+    def fragments_pending(self) -> int:
+        ...
+
+
+class SegmentEngine(Engine):
+    # Pending segments as parallel lists sorted by first index. Segments
+    # never overlap or touch, so both lists are sorted. Each segment is a
+    # deque of views into the inserted payloads: merging moves views around
+    # and bytes are only copied once, by the storage of the stream.
+    # Payloads that are not bytes are snapshotted first, see _pin.
+    __firsts: list[int]
+    __lasts: list[int]
+    __datas: list[deque[memoryview]]
+    __pending: int
+
+    def __init__(self, cap: int):
+        self.__firsts = []
+        self.__lasts = []
+        self.__datas = []
+        self.__pending = 0
+
+    def store(self, first: int, data: Buffer):
+        self.__store(first, data, 0)
+
+    def store_many(self, segs: Iterable[tuple[int, Buffer]]):
+        # Segments sorted by first index land at non-decreasing positions,
+        # so each search can start where the previous one ended.
+        lo = 0
+        for first, data in segs:
+            lo = self.__store(first, data, lo)
+
+    def __store(self, first: int, data: Buffer, lo: int) -> int:
+        last = first + len(data)
+        firsts, lasts, datas = self.__firsts, self.__lasts, self.__datas
+
+        # Fast paths for the common single-loss pattern: in-order arrivals
+        # past the last segment extend it, and the retransmission filling
+        # the head hole never needs the first search.
+        if len(lasts) == 0 or first > lasts[-1]:
+            firsts.append(first)
+            lasts.append(last)
+            datas.append(deque((_pin(data), )))
+            self.__pending += len(data)
+            return len(lasts) - 1
+        if first == lasts[-1]:
+            datas[-1].append(_pin(data))
+            lasts[-1] = last
+            self.__pending += len(data)
+            return len(lasts) - 1
+        if first > firsts[0]:
+            lo = bisect_left(lasts, first, lo)
+
+        hi = bisect_right(firsts, last, lo)
+        if lo == hi:
+            firsts.insert(lo, first)
+            lasts.insert(lo, last)
+            datas.insert(lo, deque((_pin(data), )))
+            self.__pending += len(data)
+            return lo
+
+        # Newer bytes win: the overlapped parts of the segments at both
+        # ends are cut off, segments in between are dropped whole.
+        left = datas[lo] if firsts[lo] < first else None
+        right = datas[hi - 1] if lasts[hi - 1] > last else None
+        if left is not None and left is right:
+            right = _split_tail(left, lasts[lo] - last)
+            _split_tail(left, last - first)
+        else:
+            if left is not None:
+                _split_tail(left, lasts[lo] - first)
+            if right is not None:
+                _drop_head(right, last - firsts[hi - 1])
+        view = _pin(data)
+        if left is not None and right is not None:
+            if len(left) >= len(right):
+                left.append(view)
+                left.extend(right)
+                pieces = left
+            else:
+                right.appendleft(view)
+                right.extendleft(reversed(left))
+                pieces = right
+        elif left is not None:
+            left.append(view)
+            pieces = left
+        elif right is not None:
+            right.appendleft(view)
+            pieces = right
+        else:
+            pieces = deque((view, ))
+
+        first, last = min(first, firsts[lo]), max(last, lasts[hi - 1])
+        for i in range(lo, hi):
+            self.__pending -= lasts[i] - firsts[i]
+        self.__pending += last - first
+        firsts[lo:hi] = [first]
+        lasts[lo:hi] = [last]
+        datas[lo:hi] = [pieces]
+        return lo
+
+    def flush(self, idx: int) -> list[Buffer]:
+        if len(self.__firsts) == 0 or self.__firsts[0] != idx:
+            return []
+        self.__pending -= self.__lasts[0] - idx
+        pieces = self.__datas[0]
+        del self.__firsts[0], self.__lasts[0], self.__datas[0]
+        return list(pieces)
+
+    def prune(self) -> int:
+        n = self.__lasts.pop() - self.__firsts.pop()
+        self.__datas.pop()
+        self.__pending -= n
+        return n
+
+    def discard_from(self, idx: int):
+        firsts, lasts, datas = self.__firsts, self.__lasts, self.__datas
+        i = bisect_left(firsts, idx)
+        for j in range(i, len(firsts)):
+            self.__pending -= lasts[j] - firsts[j]
+        del firsts[i:], lasts[i:], datas[i:]
+        if i == 0 or lasts[-1] <= idx:
+            return
+        extra = lasts[-1] - idx
+        self.__pending -= extra
+        lasts[-1] = idx
+        _split_tail(datas[-1], extra)
+
+    def fragment_at(self, idx: int) -> Optional[tuple[int, int]]:
+        i = bisect_right(self.__firsts, idx) - 1
+        if i < 0 or self.__lasts[i] <= idx:
+            return None
+        return self.__firsts[i], self.__lasts[i]
+
+    def fragments(self) -> list[tuple[int, int]]:
+        return list(zip(self.__firsts, self.__lasts))
+
+    def bytes_pending(self) -> int:
+        return self.__pending
+
+    def fragments_pending(self) -> int:
+        return len(self.__firsts)
+
+
+class WindowEngine(Engine):
+    # Pending bytes are written in place into a buffer covering the window
+    # and a parallel bytearray marks which of them are present, so every
+    # operation only touches the bytes it covers. Both are twice the window
+    # and slid back to the front once the window passes the middle; the map
+    # has one extra byte that stays zero and ends every run.
+    volatile_views = True
+
+    __size: int
+    __buf: bytearray
+    __view: memoryview
+    __map: bytearray
+    __ones: bytes
+    __base: int
+    __start: int
+    __pending: int
+    __fragments: int
+
+    def __init__(self, cap: int):
+        self.__size = cap
+        self.__buf = bytearray(2 * cap)
+        self.__view = memoryview(self.__buf)
+        self.__map = bytearray(2 * cap + 1)
+        self.__ones = b'\x01' * cap
+        self.__base = 0
+        self.__start = 0
+        self.__pending = 0
+        self.__fragments = 0
+
+    def __compact(self):
+        start, end = self.__start, 2 * self.__size
+        self.__view[:end - start] = self.__view[start:end]
+        self.__map[:end - start] = self.__map[start:end]
+        self.__map[end - start:end] = bytes(start)
+        self.__start = 0
+
+    def store(self, first: int, data: Buffer):
+        if self.__start > self.__size:
+            self.__compact()
+        n = len(data)
+        pos = self.__start + first - self.__base
+        self.__view[pos:pos + n] = data
+
+        # Runs touching [pos, pos + n) merge with the new bytes: those
+        # starting inside it or right at its end, plus one reaching it from
+        # the left.
+        m = self.__map
+        lo = max(pos - 1, 0)
+        around = m[lo:pos + n + 1]
+        touched = around.count(b'\x00\x01') + around[0]
+        self.__fragments += 1 - touched
+        self.__pending += m.count(0, pos, pos + n)
+        m[pos:pos + n] = memoryview(self.__ones)[:n]
+
+    def flush(self, idx: int) -> list[Buffer]:
+        start = self.__start
+        end = self.__map.find(0, start)
+        n = end - start
+        if n == 0:
+            return []
+        self.__map[start:end] = bytes(n)
+        self.__start = end
+        self.__base += n
+        self.__pending -= n
+        self.__fragments -= 1
+        return [self.__view[start:end]]
+
+    def prune(self) -> int:
+        m = self.__map
+        hi = m.rfind(1) + 1
+        lo = m.rfind(0, 0, hi) + 1
+        m[lo:hi] = bytes(hi - lo)
+        self.__pending -= hi - lo
+        self.__fragments -= 1
+        return hi - lo
+
+    def discard_from(self, idx: int):
+        m = self.__map
+        pos = self.__start + idx - self.__base
+        if pos >= len(m):
+            return
+        tail = m[pos - 1:] if pos > 0 else b'\x00' + m
+        self.__fragments -= tail.count(b'\x00\x01')
+        self.__pending -= m.count(1, pos)
+        m[pos:] = bytes(len(m) - pos)
+
+    def fragment_at(self, idx: int) -> Optional[tuple[int, int]]:
+        pos = self.__start + idx - self.__base
+        m = self.__map
+        if pos < self.__start or pos >= len(m) or m[pos] == 0:
+            return None
+        lo = m.rfind(0, 0, pos) + 1
+        hi = m.find(0, pos)
+        return self.__pos_idx(lo), self.__pos_idx(hi)
+
+    def fragments(self) -> list[tuple[int, int]]:
+        fragments: list[tuple[int, int]] = []
+        m = self.__map
+        pos = self.__start
+        while True:
+            lo = m.find(1, pos)
+            if lo < 0:
+                return fragments
+            pos = m.find(0, lo)
+            fragments.append((self.__pos_idx(lo), self.__pos_idx(pos)))
+
+    def __pos_idx(self, pos: int) -> int:
+        return self.__base + pos - self.__start
+
+    def bytes_pending(self) -> int:
+        return self.__pending
+
+    def fragments_pending(self) -> int:
+        return self.__fragments
+
+
 class Reassembler(Stream):
-    __segs: deque[_Segment]
+    __engine: Engine
+    __eof_idx: Optional[int]
+    __max_fragments: Optional[int]
+    __fragment_overhead: int
+    __fragments_pruned: int
+    __bytes_pruned: int
+    __recent: deque[int]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self,
+                 *args,
+                 engine: Callable[[int], Engine] = SegmentEngine,
+                 max_fragments: Optional[int] = None,
+                 fragment_overhead: int = 0,
+                 **kwargs):
         super().__init__(*args, **kwargs)
-        self.__segs = deque()
+        self.__engine = engine(self.cap())
+        self.__eof_idx = None
+        self.__max_fragments = max_fragments
+        self.__fragment_overhead = fragment_overhead
+        self.__fragments_pruned = 0
+        self.__bytes_pruned = 0
+        self.__recent = deque(maxlen=4 * SACK_MAX_BLOCKS)
 
-    def insert(self, idx: int, data: bytes, eof: bool = False):
+    def insert(self, idx: int, data: Buffer, eof: bool = False):
         self.insert_segment(_Segment(idx, idx + len(data), data, eof))
 
     def insert_segment(self, seg: _Segment):
         min_idx = self.bytes_pushed()
         max_idx = min_idx + self.cap()
 
-        _seg: Optional[_Segment] = seg.narrow(min_idx, max_idx)
+        _seg: Optional[_Segment] = self.__narrow(seg, min_idx, max_idx)
         if _seg is None:
             return
         seg = _seg
 
-        segs: deque[_Segment] = deque()
-        seg_appended = False
-
-        for s in self.__segs:
-            if seg_appended or s.last < seg.first:
-                segs.append(s)
-                continue
-            if s.first > seg.last:
-                segs.append(seg)
-                seg_appended = True
-                segs.append(s)
-                continue
-            if s.first < seg.first:
-                seg.data = s.data[:seg.first - s.first] + seg.data
-                seg.first = s.first
-            if seg.eof:
-                break
-            if s.last >= seg.last:
-                seg.data += s.data[seg.last - s.first:]
-                seg.last = s.last
-                seg.eof = s.eof
-
-        if not seg_appended:
-            segs.append(seg)
-
-        self.__segs = segs
-
-        if seg.first == min_idx:
-            self.__segs.popleft()
-            if len(seg.data) != 0:
-                self.push(seg.data)
-            if seg.eof:
-                self.close()
+        # Nothing pending starts at min_idx, so only a segment starting
+        # there can make data assemble.
+        if seg.first < seg.last:
+            self.__engine.store(seg.first, seg.data)
+            self.__recent.append(seg.first)
+            if seg.first == min_idx:
+                self.__assemble(min_idx)
+            self.__prune()
+        if self.bytes_pushed() == self.__eof_idx:
+            self.close()
+
+    def insert_many(self, segs: Iterable[tuple[int, Buffer, bool]]):
+        min_idx = self.bytes_pushed()
+        max_idx = min_idx + self.cap()
+
+        # Every EOF in the batch is seen before anything is narrowed, so
+        # that no segment sorted ahead of the FIN keeps bytes past it.
+        _segs = [
+            _Segment(idx, idx + len(data), data, eof)
+            for idx, data, eof in sorted(segs, key=itemgetter(0))
+        ]
+        for seg in _segs:
+            self.__record_eof(seg, min_idx)
+
+        batch: list[tuple[int, Buffer]] = []
+        for seg in _segs:
+            _seg = self.__narrow(seg, min_idx, max_idx)
+            if _seg is not None and _seg.first < _seg.last:
+                batch.append((_seg.first, _seg.data))
+
+        self.__engine.store_many(batch)
+        self.__recent.extend(first for first, _ in batch)
+        if len(batch) > 0 and batch[0][0] == min_idx:
+            self.__assemble(min_idx)
+        self.__prune()
+        if self.bytes_pushed() == self.__eof_idx:
+            self.close()
+
+    def __record_eof(self, seg: _Segment, min_idx: int):
+        # Once the final length is known nothing past it can be valid:
+        # drop what is pending there and clip every later segment.
+        if seg.eof and self.__eof_idx is None and seg.last >= min_idx:
+            self.__eof_idx = seg.last
+            self.__engine.discard_from(seg.last)
+
+    def __narrow(self, seg: _Segment, min_idx: int,
+                 max_idx: int) -> Optional[_Segment]:
+        self.__record_eof(seg, min_idx)
+        if self.__eof_idx is not None:
+            max_idx = min(max_idx, self.__eof_idx)
+        return seg.narrow(min_idx, max_idx)
+
+    def __assemble(self, min_idx: int):
+        bufs = self.__engine.flush(min_idx)
+        if self.borrows_buffers() and self.__engine.volatile_views:
+            bufs = [bytes(buf) for buf in bufs]
+        self.push_many(bufs)
+
+    def __over_limit(self) -> bool:
+        fragments = self.__engine.fragments_pending()
+        if self.__max_fragments is not None and \
+                fragments > self.__max_fragments:
+            return True
+        return self.__engine.bytes_pending() + \
+            fragments * self.__fragment_overhead > self.cap()
+
+    def __prune(self):
+        # Drop the fragments furthest from bytes_pushed first: they are the
+        # least likely to be assembled soon.
+        while self.__engine.fragments_pending() > 0 and self.__over_limit():
+            self.__bytes_pruned += self.__engine.prune()
+            self.__fragments_pruned += 1
 
     def bytes_pending(self) -> int:
-        return sum(len(seg.data) for seg in self.__segs)
+        return self.__engine.bytes_pending()
+
+    def fragments_pending(self) -> int:
+        return self.__engine.fragments_pending()
+
+    def sack_blocks(self,
+                    max_blocks: int = SACK_MAX_BLOCKS
+                    ) -> list[tuple[int, int]]:
+        # RFC 2018: the first block holds the most recently received
+        # segment, the others follow in order of recency.
+        blocks: list[tuple[int, int]] = []
+        for idx in reversed(self.__recent):
+            if len(blocks) == max_blocks:
+                return blocks
+            block = self.__engine.fragment_at(idx)
+            if block is not None and block not in blocks:
+                blocks.append(block)
+        if len(blocks) < min(max_blocks, self.fragments_pending()):
+            for block in self.__engine.fragments():
+                if len(blocks) == max_blocks:
+                    break
+                if block not in blocks:
+                    blocks.append(block)
+        return blocks
+
+    def fragments_pruned(self) -> int:
+        return self.__fragments_pruned
+
+    def bytes_pruned(self) -> int:
+        return self.__bytes_pruned
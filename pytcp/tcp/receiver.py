@@ -15,10 +15,11 @@ class Receiver(Reassembler):
     def receive_sender_message(self, msg: SenderMessage):
         if msg.syn:
             self.__isn = msg.seqno
-            msg.seqno += 1
         if self.__isn is None:
             return
-        idx = self.__isn.unwrap(msg.seqno, self.bytes_pushed()) - 1
+        idx = self.__isn.unwrap(msg.seqno, self.bytes_pushed())
+        if not msg.syn:
+            idx -= 1
         self.insert(idx, msg.payload, msg.fin)
 
     def receiver_message(self) -> ReceiverMessage:
@@ -27,7 +28,8 @@ class Receiver(Reassembler):
             winsize = 0xffff
         if self.__isn is None:
             return ReceiverMessage(None, winsize)
-        ackno = self.__isn.wrap(self.bytes_pushed() + 1)
-        if self.is_closed():
-            ackno += 1
-        return ReceiverMessage(ackno, winsize)
+        ackno = self.__isn.wrap(self.bytes_pushed() +
+                                (2 if self.is_closed() else 1))
+        sack = tuple((self.__isn.wrap(first + 1), self.__isn.wrap(last + 1))
+                     for first, last in self.sack_blocks())
+        return ReceiverMessage(ackno, winsize, sack)
@@ -17,9 +17,17 @@ class _Segment:
     bof: bool
     eof: bool
 
-    def sender_message(self, isn: Wrap32) -> SenderMessage:
-        return SenderMessage(isn.wrap(self.first), self.bof, self.eof,
-                             self.data)
+    def sender_message(self,
+                       isn: Wrap32,
+                       msg: Optional[SenderMessage] = None) -> SenderMessage:
+        if msg is None:
+            return SenderMessage(isn.wrap(self.first), self.bof, self.eof,
+                                 self.data)
+        msg.seqno = isn.wrap(self.first)
+        msg.syn = self.bof
+        msg.fin = self.eof
+        msg.payload = self.data
+        return msg
 
 
 class Sender(Stream):
@@ -39,11 +47,14 @@ class Sender(Stream):
     __segs: deque[_Segment]
     __outstanding_segs: deque[_Segment]
 
+    __message: Optional[SenderMessage]
+
     def __init__(self,
                  *args,
                  isn: Optional[int] = None,
                  mss: int = SENDER_MSS,
                  irto: int = SENDER_IRTO,
+                 reuse_messages: bool = False,
                  **kwargs):
         super().__init__(*args, **kwargs)
         self.__isn = Wrap32(isn if isn is not None else random.getrandbits(32))
@@ -62,6 +73,11 @@ class Sender(Stream):
         self.__segs = deque()
         self.__outstanding_segs = deque()
 
+        # With reuse_messages every call returns the same SenderMessage, so a
+        # message is only valid until the next one is requested.
+        self.__message = SenderMessage(self.__isn, False, False, b'') \
+            if reuse_messages else None
+
     @property
     def __last_seqno(self):
         return self.__seqno if len(self.__segs) == 0 else self.__segs[-1].last
@@ -99,14 +115,15 @@ class Sender(Stream):
 
         cap = self.__ackno + max(1, self.__winsize) - self.__last_seqno
         to_pop = min(cap, self.bytes_buffered())
-        data = self.pop(to_pop)
 
-        while len(data) > 0:
-            seg = self.__ensure_last_extensible_seg()
-            to_fill = min(self.__mss - len(seg.data), len(data))
-            seg.data += data[:to_fill]
-            seg.last += to_fill
-            data = data[to_fill:]
+        for view in self.peek_views(to_pop):
+            while len(view) > 0:
+                seg = self.__ensure_last_extensible_seg()
+                to_fill = min(self.__mss - len(seg.data), len(view))
+                seg.data += view[:to_fill]
+                seg.last += to_fill
+                view = view[to_fill:]
+        self.skip(to_pop)
 
         if to_pop < cap and self.is_finished():
             seg = self.__ensure_last_seg()
@@ -123,10 +140,18 @@ class Sender(Stream):
             if len(self.__outstanding_segs) == 0:
                 self.__to = self.__rto
             self.__outstanding_segs.append(seg)
-        return seg.sender_message(self.__isn)
+        return seg.sender_message(self.__isn, self.__message)
 
     def empty_sender_message(self) -> SenderMessage:
-        return SenderMessage(self.__isn.wrap(self.__seqno), False, False, b'')
+        msg = self.__message
+        if msg is None:
+            return SenderMessage(self.__isn.wrap(self.__seqno), False, False,
+                                 b'')
+        msg.seqno = self.__isn.wrap(self.__seqno)
+        msg.syn = False
+        msg.fin = False
+        msg.payload = b''
+        return msg
 
     def receive_receiver_message(self, msg: ReceiverMessage):
         if msg.ackno is None:
@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from .defaults import STREAM_CAP
+from .storage import Buffer, RingStorage, Storage
+from .stream import Stream
+
+
+class SPSCStream(Stream):
+    __cond: threading.Condition
+    __waiting: int
+
+    def __init__(self,
+                 cap: int = STREAM_CAP,
+                 storage: Callable[[int], Storage] = RingStorage):
+        # RingStorage is safe for one producer and one consumer: the writer
+        # only advances its write position and the reader its read position.
+        def ring(cap: int) -> Storage:
+            buf = storage(cap)
+            if not isinstance(buf, RingStorage):
+                raise TypeError('SPSCStream needs a RingStorage')
+            return buf
+
+        super().__init__(cap, storage=ring)
+        self.__cond = threading.Condition()
+        self.__waiting = 0
+
+    def __notify(self):
+        if self.__waiting > 0:
+            with self.__cond:
+                self.__cond.notify_all()
+
+    def __wait_for(self, predicate: Callable[[], bool],
+                   deadline: Optional[float]) -> bool:
+        with self.__cond:
+            self.__waiting += 1
+            try:
+                timeout = None if deadline is None else \
+                    deadline - time.monotonic()
+                return self.__cond.wait_for(predicate, timeout)
+            finally:
+                self.__waiting -= 1
+
+    @staticmethod
+    def __deadline(timeout: Optional[float]) -> Optional[float]:
+        return None if timeout is None else time.monotonic() + timeout
+
+    def _on_push(self, n: int):
+        self.__notify()
+
+    def _on_pop(self, n: int):
+        self.__notify()
+
+    def pop_chunks(self, max_bytes: int = -1) -> list[memoryview]:
+        # Popped bytes are free space the producer may overwrite at once, so
+        # views into the ring cannot outlive the pop: hand out a copy.
+        # peek_views() followed by skip() is the zero-copy way to read.
+        buf = self.pop(max_bytes)
+        return [memoryview(buf)] if len(buf) > 0 else []
+
+    def __writable(self) -> bool:
+        return self.cap() > 0 or self.has_error()
+
+    def __readable(self) -> bool:
+        return self.bytes_buffered() > 0 or self.is_closed() or \
+            self.has_error()
+
+    def write(self, data: Buffer, timeout: Optional[float] = None) -> int:
+        view = memoryview(data)
+        deadline = self.__deadline(timeout)
+        written = 0
+        while True:
+            written += self.push(view[written:])
+            if written == len(view) or self.has_error():
+                return written
+            if not self.__wait_for(self.__writable, deadline):
+                return written
+
+    def read(self, n: int = -1, timeout: Optional[float] = None) -> bytes:
+        if not self.__readable() and \
+                not self.__wait_for(self.__readable, self.__deadline(timeout)):
+            return b''
+        return self.pop(n)
+
+    def read_into(self, buf: Buffer, timeout: Optional[float] = None) -> int:
+        if not self.__readable() and \
+                not self.__wait_for(self.__readable, self.__deadline(timeout)):
+            return 0
+        return self.pop_into(buf)
@@ -0,0 +1,241 @@
+import mmap
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Optional, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class Storage(ABC):
+    borrows: bool = False
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def push(self, buf: Buffer):
+        ...
+
+    @abstractmethod
+    def views(self, n: int) -> list[memoryview]:
+        ...
+
+    @abstractmethod
+    def pop(self, n: int) -> bytes:
+        ...
+
+    @abstractmethod
+    def skip(self, n: int):
+        ...
+
+    def pop_into(self, buf: memoryview) -> int:
+        n = 0
+        for view in self.views(len(buf)):
+            buf[n:n + len(view)] = view
+            n += len(view)
+        self.skip(n)
+        return n
+
+
+class BytesStorage(Storage):
+    __buf: bytes
+
+    def __init__(self, cap: int):
+        self.__buf = b''
+
+    def __len__(self) -> int:
+        return len(self.__buf)
+
+    def push(self, buf: Buffer):
+        self.__buf += buf
+
+    def views(self, n: int) -> list[memoryview]:
+        return [memoryview(self.__buf)[:n]] if n > 0 else []
+
+    def pop(self, n: int) -> bytes:
+        buf, self.__buf = self.__buf[:n], self.__buf[n:]
+        return buf
+
+    def skip(self, n: int):
+        self.__buf = self.__buf[n:]
+
+
+class RingStorage(Storage):
+    __size: int
+    __buf: Union[bytearray, memoryview, mmap.mmap]
+    __view: memoryview
+    __rpos: int
+    __wpos: int
+
+    def __init__(self,
+                 cap: int,
+                 buf: Optional[Union[bytearray, memoryview,
+                                     mmap.mmap]] = None):
+        self.__size = cap
+        self.__buf = buf if buf is not None else bytearray(cap)
+        self.__view = memoryview(self.__buf)
+        # Absolute read/write positions: the reader only advances rpos and
+        # the writer only advances wpos.
+        self.__rpos = 0
+        self.__wpos = 0
+
+    def __len__(self) -> int:
+        return self.__wpos - self.__rpos
+
+    def push(self, buf: Buffer):
+        n = len(buf)
+        if n == 0:
+            return
+        pos = self.__wpos % self.__size
+        first = self.__size - pos
+        if n <= first:
+            self.__view[pos:pos + n] = buf
+        else:
+            view = memoryview(buf)
+            self.__view[pos:] = view[:first]
+            self.__view[:n - first] = view[first:]
+        self.__wpos += n
+
+    def views(self, n: int) -> list[memoryview]:
+        if n == 0:
+            return []
+        pos = self.__rpos % self.__size
+        end = pos + n
+        if end <= self.__size:
+            return [self.__view[pos:end]]
+        return [self.__view[pos:], self.__view[:end - self.__size]]
+
+    def pop(self, n: int) -> bytes:
+        views = self.views(n)
+        buf = views[0].tobytes() if len(views) == 1 else b''.join(views)
+        self.skip(n)
+        return buf
+
+    def skip(self, n: int):
+        self.__rpos += n
+
+    def close(self):
+        self.__view.release()
+
+
+class MmapStorage(RingStorage):
+    __map: mmap.mmap
+    __size: int
+    __release: int
+    __released: int
+    __consumed: int
+
+    def __init__(self,
+                 cap: int,
+                 path: Optional[str] = None,
+                 release: int = 1 << 20):
+        if path is None:
+            # Private: MADV_DONTNEED on shared anonymous memory leaves the
+            # pages in shmem instead of freeing them.
+            self.__map = mmap.mmap(-1, max(cap, 1), flags=mmap.MAP_PRIVATE)
+        else:
+            with open(path, 'w+b') as f:
+                f.truncate(max(cap, 1))
+                self.__map = mmap.mmap(f.fileno(), max(cap, 1))
+        super().__init__(cap, self.__map)
+        self.__size = cap
+        self.__release = release
+        self.__released = 0
+        self.__consumed = 0
+
+    def __enter__(self) -> 'MmapStorage':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def skip(self, n: int):
+        super().skip(n)
+        self.__consumed += n
+        if self.__consumed - self.__released >= self.__release:
+            self.__release_pages()
+
+    def close(self):
+        # Fails with BufferError while views handed out are still alive.
+        super().close()
+        self.__map.close()
+
+    def ring_bytes(self, start: int, stop: int) -> bytes:
+        # Raw ring contents, buffered or not, for tests and debugging.
+        return self.__map[start:stop]
+
+    def __release_pages(self):
+        # Hand fully consumed pages back to the kernel so that only the
+        # pages holding buffered bytes stay resident. Bytes consumed before
+        # wpos - size share their pages with unread bytes, so only the free
+        # part of the ring right behind the read position is released.
+        stop = self.__consumed
+        start = max(self.__released, stop + len(self) - self.__size)
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            while start < stop:
+                pos = start % self.__size
+                end = min(pos + stop - start, self.__size)
+                first = -(-pos // mmap.PAGESIZE) * mmap.PAGESIZE
+                last = end // mmap.PAGESIZE * mmap.PAGESIZE
+                if first < last:
+                    self.__map.madvise(mmap.MADV_DONTNEED, first, last - first)
+                start += end - pos
+        self.__released = stop - stop % self.__size % mmap.PAGESIZE
+
+
+class ChunkStorage(Storage):
+    borrows = True
+
+    __chunks: deque[Buffer]
+    __offset: int
+    __len: int
+
+    def __init__(self, cap: int):
+        self.__chunks = deque()
+        self.__offset = 0
+        self.__len = 0
+
+    def __len__(self) -> int:
+        return self.__len
+
+    def push(self, buf: Buffer):
+        if len(buf) == 0:
+            return
+        self.__chunks.append(buf)
+        self.__len += len(buf)
+
+    def views(self, n: int) -> list[memoryview]:
+        views = []
+        offset = self.__offset
+        for chunk in self.__chunks:
+            if n == 0:
+                break
+            view = memoryview(chunk)[offset:offset + n]
+            views.append(view)
+            n -= len(view)
+            offset = 0
+        return views
+
+    def pop(self, n: int) -> bytes:
+        if n == 0:
+            return b''
+        head = self.__chunks[0]
+        if self.__offset == 0 and len(head) == n and type(head) is bytes:
+            self.__chunks.popleft()
+            self.__len -= n
+            return head
+        buf = b''.join(self.views(n))
+        self.skip(n)
+        return buf
+
+    def skip(self, n: int):
+        self.__len -= n
+        while n > 0:
+            rest = len(self.__chunks[0]) - self.__offset
+            if n < rest:
+                self.__offset += n
+                return
+            n -= rest
+            self.__chunks.popleft()
+            self.__offset = 0
@@ -1,53 +1,131 @@
+from typing import Callable, Iterable
+
 from .defaults import STREAM_CAP
+from .storage import Buffer, RingStorage, Storage
 
 
 class Stream:
     __cap: int
-    __buf: bytes
+    __storage: Storage
     __is_closed: bool
     __has_error: bool
     __bytes_pushed: int
     __bytes_popped: int
 
-    def __init__(self, cap: int = STREAM_CAP):
+    def __init__(self,
+                 cap: int = STREAM_CAP,
+                 storage: Callable[[int], Storage] = RingStorage):
         self.__cap = cap
-        self.__buf = b''
+        self.__storage = storage(cap)
         self.__is_closed = False
         self.__has_error = False
         self.__bytes_pushed = 0
         self.__bytes_popped = 0
 
-    def push(self, buf: bytes):
+    def push(self, buf: Buffer) -> int:
         to_push = min(len(buf), self.cap())
-        self.__buf += buf[:to_push]
+        if to_push == 0:
+            return 0
+        if to_push < len(buf):
+            buf = memoryview(buf)[:to_push]
+        self.__storage.push(buf)
         self.__bytes_pushed += to_push
+        self._on_push(to_push)
+        return to_push
+
+    def push_many(self, bufs: Iterable[Buffer]) -> int:
+        cap = self.cap()
+        pushed = 0
+        for buf in bufs:
+            if pushed == cap:
+                break
+            to_push = min(len(buf), cap - pushed)
+            if to_push < len(buf):
+                buf = memoryview(buf)[:to_push]
+            self.__storage.push(buf)
+            pushed += to_push
+        self.__bytes_pushed += pushed
+        if pushed > 0:
+            self._on_push(pushed)
+        return pushed
 
     def close(self):
         self.__is_closed = True
+        self._on_push(0)
 
     def set_error(self):
         self.__has_error = True
+        self._on_push(0)
+        self._on_pop(0)
 
     def is_closed(self) -> bool:
         return self.__is_closed
 
     def cap(self) -> int:
-        return self.__cap - len(self.__buf)
+        return self.__cap - len(self.__storage)
 
     def bytes_pushed(self) -> int:
         return self.__bytes_pushed
 
     def peek(self) -> bytes:
-        return self.__buf
+        return b''.join(self.peek_views())
+
+    def peek_view(self, max_len: int = -1) -> memoryview:
+        views = self.peek_views(max_len)
+        return views[0] if len(views) > 0 else memoryview(b'')
+
+    def peek_views(self, max_len: int = -1) -> list[memoryview]:
+        return self.__storage.views(self.__readable(max_len))
 
     def pop(self, n: int = -1) -> bytes:
-        if n < 0:
-            n = self.bytes_buffered()
-        to_pop = min(self.bytes_buffered(), n)
-        buf, self.__buf = self.__buf[:to_pop], self.__buf[to_pop:]
+        to_pop = self.__readable(n)
+        buf = self.__storage.pop(to_pop)
         self.__bytes_popped += to_pop
+        if to_pop > 0:
+            self._on_pop(to_pop)
         return buf
 
+    def pop_chunks(self, max_bytes: int = -1) -> list[memoryview]:
+        # The views share memory with the storage: with RingStorage they are
+        # only valid until the next push.
+        to_pop = self.__readable(max_bytes)
+        views = self.__storage.views(to_pop)
+        self.__storage.skip(to_pop)
+        self.__bytes_popped += to_pop
+        if to_pop > 0:
+            self._on_pop(to_pop)
+        return views
+
+    def pop_into(self, buf: Buffer) -> int:
+        view = memoryview(buf).cast('B')
+        n = self.__storage.pop_into(view[:self.bytes_buffered()])
+        self.__bytes_popped += n
+        if n > 0:
+            self._on_pop(n)
+        return n
+
+    def skip(self, n: int = -1) -> int:
+        to_skip = self.__readable(n)
+        self.__storage.skip(to_skip)
+        self.__bytes_popped += to_skip
+        if to_skip > 0:
+            self._on_pop(to_skip)
+        return to_skip
+
+    # Called after n bytes are pushed or popped. Closing the stream counts
+    # as a push of 0 bytes and an error as both, so that subclasses can wake
+    # up whoever waits on the other end.
+    def _on_push(self, n: int):
+        pass
+
+    def _on_pop(self, n: int):
+        pass
+
+    def __readable(self, n: int) -> int:
+        if n < 0:
+            return self.bytes_buffered()
+        return min(self.bytes_buffered(), n)
+
     def is_finished(self) -> bool:
         return self.bytes_buffered() == 0 and self.is_closed()
 
@@ -55,7 +133,10 @@ class Stream:
         return self.__has_error
 
     def bytes_buffered(self) -> int:
-        return len(self.__buf)
+        return len(self.__storage)
 
     def bytes_popped(self) -> int:
         return self.__bytes_popped
+
+    def borrows_buffers(self) -> bool:
+        return self.__storage.borrows
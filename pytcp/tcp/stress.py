@@ -0,0 +1,366 @@
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Callable, Optional, Union
+
+from .reassembler import Engine, Reassembler
+from .stream import Stream
+
+Insert = tuple[int, bytes, bool]
+
+# One insert() call, or insert_many() for several segments, the bytes to pop
+# afterwards, then the expected bytes_pushed, bytes_pending,
+# fragments_pending and is_closed right after the call. The legacy oracle
+# has no fragments_pending, which is then None and not compared.
+Step = tuple[list[Insert], int, int, int, Optional[int], bool]
+
+
+@dataclass
+class _LegacySegment:
+    first: int
+    last: int
+    data: bytes
+    eof: bool
+
+    def narrow(self, min_idx: int, max_idx: int) -> Optional['_LegacySegment']:
+        if self.first > max_idx or self.last < min_idx:
+            return None
+        seg = _LegacySegment(self.first, self.last, self.data, self.eof)
+        if seg.last > max_idx:
+            seg.data = seg.data[:max_idx - seg.first]
+            seg.last = max_idx
+        if seg.first < min_idx:
+            seg.data = seg.data[min_idx - seg.first:]
+            seg.first = min_idx
+        return seg
+
+
+class LegacyReassembler(Stream):
+    # tcp.reassembler.Reassembler before the engines, kept as the stress
+    # oracle. It closes the stream early when an EOF segment is clipped at
+    # the window edge, ignores an EOF seen outside the window, loses the EOF
+    # once bytes past it arrive, and neither prunes nor batches: workloads
+    # replayed against it stay clear of all of these.
+    __segs: deque[_LegacySegment]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__segs = deque()
+
+    def insert(self, idx: int, data: bytes, eof: bool = False):
+        self.insert_segment(_LegacySegment(idx, idx + len(data), data, eof))
+
+    def insert_segment(self, seg: _LegacySegment):
+        min_idx = self.bytes_pushed()
+        max_idx = min_idx + self.cap()
+
+        _seg: Optional[_LegacySegment] = seg.narrow(min_idx, max_idx)
+        if _seg is None:
+            return
+        seg = _seg
+
+        segs: deque[_LegacySegment] = deque()
+        seg_appended = False
+
+        for s in self.__segs:
+            if seg_appended or s.last < seg.first:
+                segs.append(s)
+                continue
+            if s.first > seg.last:
+                segs.append(seg)
+                seg_appended = True
+                segs.append(s)
+                continue
+            if s.first < seg.first:
+                seg.data = s.data[:seg.first - s.first] + seg.data
+                seg.first = s.first
+            if seg.eof:
+                break
+            if s.last >= seg.last:
+                seg.data += s.data[seg.last - s.first:]
+                seg.last = s.last
+                seg.eof = s.eof
+
+        if not seg_appended:
+            segs.append(seg)
+
+        self.__segs = segs
+
+        if seg.first == min_idx:
+            self.__segs.popleft()
+            if len(seg.data) != 0:
+                self.push(seg.data)
+            if seg.eof:
+                self.close()
+
+    def bytes_pending(self) -> int:
+        return sum(len(seg.data) for seg in self.__segs)
+
+
+class ReferenceReassembler:
+    # Byte-granular model of the Reassembler for what LegacyReassembler
+    # cannot check: EOF handling, pruning and insert_many. present[i] is set
+    # while byte i is pending or assembled. It follows the current
+    # semantics, so it shares their assumptions, such as the window ending
+    # at bytes_popped + cap and insert() only pruning after storing
+    # something. Like every engine, newer bytes win over pending ones.
+    cap: int
+    max_fragments: Optional[int]
+    fragment_overhead: int
+    present: bytearray
+    data: bytearray
+    pushed: int
+    popped: int
+    pending: int
+    pruned: int
+    eof: int
+
+    def __init__(self,
+                 cap: int,
+                 limit: int,
+                 max_fragments: Optional[int] = None,
+                 fragment_overhead: int = 0):
+        self.cap = cap
+        self.max_fragments = max_fragments
+        self.fragment_overhead = fragment_overhead
+        self.present = bytearray(limit + 1)
+        self.data = bytearray(limit)
+        self.pushed = 0
+        self.popped = 0
+        self.pending = 0
+        self.pruned = 0
+        self.eof = -1
+
+    def insert(self, idx: int, buf: bytes, eof: bool = False):
+        self.insert_many([(idx, buf, eof)], batch=False)
+
+    def insert_many(self, segs: list[Insert], batch: bool = True):
+        segs = sorted(segs, key=itemgetter(0))
+        for idx, buf, eof in segs:
+            last = idx + len(buf)
+            if eof and self.eof < 0 and last >= self.pushed:
+                self.eof = last
+                self.pending -= self.present.count(1, last)
+                self.present[last:] = bytes(len(self.present) - last)
+        max_idx = self.popped + self.cap
+        if self.eof >= 0:
+            max_idx = min(max_idx, self.eof)
+
+        stored = False
+        for idx, buf, eof in segs:
+            first, last = max(idx, self.pushed), min(idx + len(buf), max_idx)
+            if first < last:
+                self.pending += self.present.count(0, first, last)
+                self.present[first:last] = b'\x01' * (last - first)
+                self.data[first:last] = memoryview(buf)[first - idx:last - idx]
+                stored = True
+
+        end = self.present.find(0, self.pushed)
+        self.pending -= end - self.pushed
+        self.pushed = end
+        if batch or stored:
+            self.__prune()
+
+    def __over_limit(self, fragments: int) -> bool:
+        if self.max_fragments is not None and fragments > self.max_fragments:
+            return True
+        return self.pending + fragments * self.fragment_overhead > \
+            self.cap - (self.pushed - self.popped)
+
+    def __prune(self):
+        fragments = self.fragments_pending()
+        while fragments > 0 and self.__over_limit(fragments):
+            hi = self.present.rfind(1, self.pushed) + 1
+            lo = self.present.rfind(0, self.pushed, hi) + 1
+            self.present[lo:hi] = bytes(hi - lo)
+            self.pending -= hi - lo
+            self.pruned += hi - lo
+            fragments -= 1
+
+    def pop(self, n: int) -> bytes:
+        n = min(n, self.pushed - self.popped)
+        self.popped += n
+        return bytes(self.data[self.popped - n:self.popped])
+
+    def bytes_pushed(self) -> int:
+        return self.pushed
+
+    def bytes_popped(self) -> int:
+        return self.popped
+
+    def bytes_pending(self) -> int:
+        return self.pending
+
+    def bytes_pruned(self) -> int:
+        return self.pruned
+
+    def fragments_pending(self) -> int:
+        return self.present.count(b'\x00\x01', self.pushed,
+                                  self.popped + self.cap + 1)
+
+    def is_closed(self) -> bool:
+        return self.pushed == self.eof
+
+    def is_finished(self) -> bool:
+        return self.is_closed() and self.popped == self.pushed
+
+
+@dataclass
+class Workload:
+    oracle: str
+    capacity: int
+    max_fragments: Optional[int]
+    fragment_overhead: int
+    steps: list[Step]
+    data: bytes
+    bytes_pruned: int
+
+
+def stress_workload(rd: random.Random,
+                    input_len: int,
+                    capacity: int,
+                    legacy: bool = False) -> Workload:
+    # With legacy, expected values come from LegacyReassembler and the
+    # workload steers clear of its divergences: no batches, no pruning, no
+    # bytes past the FIN and no FIN beyond the window.
+    data = rd.randbytes(input_len)
+    ref: Union[LegacyReassembler, ReferenceReassembler]
+    if legacy:
+        payload = data
+        ref = LegacyReassembler(capacity)
+        max_fragments, fragment_overhead = None, 0
+    else:
+        # Bytes past the end are junk that only shows up after the FIN.
+        payload = data + rd.randbytes(2 * capacity)
+        max_fragments = rd.choice((None, None, 1, 4))
+        fragment_overhead = rd.choice((0, 0, 8))
+        ref = ReferenceReassembler(capacity, len(payload), max_fragments,
+                                   fragment_overhead)
+    max_len = max(1, min(capacity, 1500))
+    steps: list[Step] = []
+    recent: list[Insert] = []
+    output = bytearray()
+    fin_sent = False
+
+    def segment() -> Insert:
+        nonlocal fin_sent
+        pushed = ref.bytes_pushed()
+        fin_ok = not legacy or \
+            input_len <= ref.bytes_popped() + capacity
+        kind = rd.random()
+        if fin_ok and (kind < 0.05 or (kind < 0.3 and len(recent) == 0)):
+            idx = rd.randint(max(0, input_len - max_len), input_len)
+            n, eof = input_len - idx, True
+            fin_sent = True
+        elif kind < 0.3 and len(recent) > 0:
+            return rd.choice(recent)
+        elif kind < 0.4:
+            idx = max(0, pushed + rd.randint(-capacity, capacity))
+            n, eof = rd.randint(0, 2 * capacity), False
+        else:
+            idx = max(0, pushed + rd.randint(-max_len, capacity))
+            n, eof = rd.randint(0, max_len), False
+        if not eof:
+            end = len(payload) if fin_sent else input_len
+            idx = min(idx, end)
+            n = min(n, end - idx)
+        # Now and then the bytes disagree with what was sent before, so
+        # the order in which overlapping bytes land matters.
+        buf = payload[idx:idx + n] if rd.random() < 0.9 else rd.randbytes(n)
+        return idx, buf, eof
+
+    while not ref.is_finished():
+        if isinstance(ref, ReferenceReassembler) and rd.random() < 0.2:
+            segs = [segment() for _ in range(rd.randint(2, 5))]
+            ref.insert_many(segs)
+        else:
+            segs = [segment()]
+            ref.insert(*segs[0])
+        pushed, pending = ref.bytes_pushed(), ref.bytes_pending()
+        fragments = ref.fragments_pending() \
+            if isinstance(ref, ReferenceReassembler) else None
+        closed = ref.is_closed()
+        pop = 0
+        if rd.getrandbits(1):
+            buf = ref.pop(rd.randint(0, capacity))
+            output += buf
+            pop = len(buf)
+        steps.append((segs, pop, pushed, pending, fragments, closed))
+        recent.extend(segs)
+        del recent[:-32]
+
+    pruned = ref.bytes_pruned() if isinstance(ref, ReferenceReassembler) \
+        else 0
+    return Workload('legacy' if legacy else 'model', capacity, max_fragments,
+                    fragment_overhead, steps, bytes(output), pruned)
+
+
+def stress_replay(engine: Callable[[int], Engine],
+                  workload: Workload) -> float:
+    reassembler = Reassembler(workload.capacity,
+                              engine=engine,
+                              max_fragments=workload.max_fragments,
+                              fragment_overhead=workload.fragment_overhead)
+    output = bytearray()
+
+    start = time.perf_counter()
+    for i, step in enumerate(workload.steps):
+        segs, pop, pushed, pending, fragments, closed = step
+        if len(segs) == 1:
+            reassembler.insert(*segs[0])
+        else:
+            reassembler.insert_many(segs)
+        if reassembler.bytes_pushed() != pushed or \
+                reassembler.bytes_pending() != pending or \
+                fragments not in (None, reassembler.fragments_pending()) or \
+                reassembler.is_closed() != closed:
+            raise RuntimeError(
+                f'Step {i} {[(idx, len(buf), eof) for idx, buf, eof in segs]}'
+                f': got pushed={reassembler.bytes_pushed()}, '
+                f'pending={reassembler.bytes_pending()}, '
+                f'fragments={reassembler.fragments_pending()}, '
+                f'closed={reassembler.is_closed()}, expected '
+                f'pushed={pushed}, pending={pending}, '
+                f'fragments={fragments}, closed={closed}')
+        if pop > 0:
+            output += reassembler.pop(pop)
+    stop = time.perf_counter()
+
+    if not reassembler.is_finished():
+        raise RuntimeError('Reassembler did not finish')
+    if output != workload.data:
+        raise RuntimeError('Mismatch between data inserted and read')
+    if reassembler.bytes_pruned() != workload.bytes_pruned:
+        raise RuntimeError(f'Pruned {reassembler.bytes_pruned()} bytes, '
+                           f'expected {workload.bytes_pruned}')
+    return stop - start
+
+
+def stress_test(engines: dict[str, Callable[[int], Engine]], input_len: int,
+                capacity: int, random_seed: int,
+                inserts: int) -> dict[str, tuple[int, int, float]]:
+    rd = random.Random(random_seed)
+    totals = {name: (0, 0, 0.0) for name in engines}
+    done = 0
+    legacy = True
+    while done < inserts:
+        # Alternate between the two oracles.
+        workload = stress_workload(rd, input_len, capacity, legacy)
+        legacy = not legacy
+        n = sum(len(segs) for segs, *_ in workload.steps)
+        done += n
+        for name, engine in engines.items():
+            try:
+                seconds = stress_replay(engine, workload)
+            except RuntimeError as e:
+                raise RuntimeError(
+                    f'{name} engine, {workload.oracle} oracle, '
+                    f'capacity={capacity}, '
+                    f'max_fragments={workload.max_fragments}, '
+                    f'fragment_overhead={workload.fragment_overhead}: {e}'
+                ) from e
+            count, nbytes, total = totals[name]
+            totals[name] = (count + n, nbytes + input_len, total + seconds)
+    return totals
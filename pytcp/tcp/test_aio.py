@@ -0,0 +1,76 @@
+import asyncio
+import random
+import unittest
+
+from .aio import AsyncStream
+
+
+class TestAsyncStream(unittest.IsolatedAsyncioTestCase):
+
+    async def test_backpressure(self):
+        test = AsyncStream(4)
+        data = random.randbytes(1000)
+        output = bytearray()
+
+        async def reader():
+            while True:
+                buf = await test.read(3)
+                if len(buf) == 0:
+                    return
+                output.extend(buf)
+
+        async def writer():
+            for i in range(0, len(data), 7):
+                await test.write(data[i:i + 7])
+                self.assertLessEqual(test.bytes_buffered(), 4)
+            await test.drain()
+            self.assertEqual(test.bytes_buffered(), 0)
+            test.close()
+
+        await asyncio.gather(reader(), writer())
+        self.assertEqual(output, data)
+        self.assertTrue(test.is_finished())
+
+    async def test_read_waits_for_data(self):
+        test = AsyncStream(4)
+        task = asyncio.create_task(test.read())
+        await asyncio.sleep(0)
+        self.assertFalse(task.done())
+        test.push(b'ab')
+        self.assertEqual(await task, b'ab')
+
+    async def test_write_waits_for_cap(self):
+        test = AsyncStream(2)
+        task = asyncio.create_task(test.write(b'abc'))
+        await asyncio.sleep(0)
+        self.assertFalse(task.done())
+        self.assertEqual(test.cap(), 0)
+        self.assertEqual(test.pop(1), b'a')
+        await task
+        self.assertEqual(test.pop(), b'bc')
+
+    async def test_wake_on_any_mutator(self):
+        test = AsyncStream(2)
+        task = asyncio.create_task(test.read())
+        await asyncio.sleep(0)
+        test.push_many([b'a', b'b'])
+        self.assertEqual(await task, b'ab')
+        test.push(b'cd')
+        task = asyncio.create_task(test.write(b'e'))
+        await asyncio.sleep(0)
+        self.assertFalse(task.done())
+        self.assertEqual(test.skip(1), 1)
+        await task
+        self.assertEqual(test.pop(), b'de')
+
+    async def test_error(self):
+        test = AsyncStream(2)
+        task = asyncio.create_task(test.read())
+        await asyncio.sleep(0)
+        test.set_error()
+        with self.assertRaises(ConnectionError):
+            await task
+
+
+if __name__ == '__main__':
+    unittest.main()
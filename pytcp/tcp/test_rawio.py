@@ -0,0 +1,66 @@
+import io
+import random
+import shutil
+import unittest
+
+from .rawio import StreamReader, StreamWriter
+from .storage import ChunkStorage
+from .stream import Stream
+
+
+class TestStreamReader(unittest.TestCase):
+
+    def test_buffered_reader(self):
+        stream = Stream(1000)
+        data = random.randbytes(1000)
+        stream.push(data)
+        stream.close()
+        output = io.BytesIO()
+        shutil.copyfileobj(io.BufferedReader(StreamReader(stream), 64), output)
+        self.assertEqual(output.getvalue(), data)
+        self.assertTrue(stream.is_finished())
+
+    def test_readinto(self):
+        stream = Stream(10)
+        test = StreamReader(stream)
+        buf = bytearray(4)
+        self.assertIsNone(test.readinto(buf))
+        stream.push(b'abcdef')
+        self.assertEqual(test.readinto(buf), 4)
+        self.assertEqual(buf, b'abcd')
+        self.assertEqual(test.read(), b'ef')
+        stream.close()
+        self.assertEqual(test.readinto(buf), 0)
+
+
+class TestStreamWriter(unittest.TestCase):
+
+    def test_write(self):
+        stream = Stream(4)
+        test = StreamWriter(stream)
+        self.assertEqual(test.write(b'abcdef'), 4)
+        self.assertIsNone(test.write(b'ef'))
+        self.assertEqual(stream.pop(), b'abcd')
+        test.close()
+        self.assertTrue(stream.is_closed())
+
+    def test_buffer_reuse(self):
+        stream = Stream(10, storage=ChunkStorage)
+        test = StreamWriter(stream)
+        buf = bytearray(b'abc')
+        test.write(buf)
+        buf[:] = b'xyz'
+        self.assertEqual(stream.pop(), b'abc')
+
+    def test_buffered_writer(self):
+        stream = Stream(1000)
+        data = random.randbytes(1000)
+        with io.BufferedWriter(StreamWriter(stream), 64) as test:
+            for i in range(0, len(data), 10):
+                test.write(data[i:i + 10])
+        self.assertEqual(stream.pop(), data)
+        self.assertTrue(stream.is_finished())
+
+
+if __name__ == '__main__':
+    unittest.main()
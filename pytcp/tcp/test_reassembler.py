@@ -1,7 +1,8 @@
 import random
 import unittest
 
-from .reassembler import Reassembler
+from .reassembler import Engine, Reassembler, SegmentEngine, WindowEngine
+from .storage import ChunkStorage
 
 
 class TestReassemblerSingle(unittest.TestCase):
@@ -389,5 +390,243 @@ class TestReassemblerOverlapping(unittest.TestCase):
         self.assertEqual(test.bytes_pending(), 0)
 
 
+class TestReassemblerRandom(unittest.TestCase):
+
+    def test_random(self):
+        for i in range(200):
+            cap = random.randint(1, 64)
+            data = random.randbytes(random.randint(0, 256))
+            test = Reassembler(cap,
+                               engine=random.choice(
+                                   (SegmentEngine, WindowEngine)))
+            pushed = 0
+            pending: set[int] = set()
+            output = bytearray()
+            while not test.is_finished():
+                batch = []
+                for j in range(random.choice((1, 1, 2, 5))):
+                    first = random.randint(0, len(data))
+                    last = random.randint(first, min(len(data),
+                                                     first + 2 * cap))
+                    batch.append((first, data[first:last], last == len(data)))
+                if len(batch) == 1:
+                    test.insert(*batch[0])
+                else:
+                    test.insert_many(batch)
+
+                max_idx = len(output) + cap
+                for first, buf, eof in batch:
+                    pending.update(
+                        range(max(first, pushed), min(first + len(buf),
+                                                      max_idx)))
+                while pushed in pending:
+                    pending.remove(pushed)
+                    pushed += 1
+                self.assertEqual(test.bytes_pushed(), pushed)
+                self.assertEqual(test.bytes_pending(), len(pending))
+                self.assertEqual(
+                    test.fragments_pending(),
+                    sum(1 for i in pending if i - 1 not in pending))
+                self.assertEqual(
+                    sorted(test.sack_blocks(len(pending))),
+                    [(i,
+                      next(j
+                           for j in range(i, max_idx + 1) if j not in pending))
+                     for i in sorted(pending) if i - 1 not in pending])
+
+                if random.getrandbits(1):
+                    output += test.pop(random.randint(0, cap))
+            self.assertEqual(output, data)
+
+    def test_max_fragments(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(100, engine=engine, max_fragments=2)
+            test.insert(6, b'g')
+            test.insert(2, b'c')
+            test.insert(4, b'e')
+            self.assertEqual(test.fragments_pending(), 2)
+            self.assertEqual(test.bytes_pending(), 2)
+            self.assertEqual(test.fragments_pruned(), 1)
+            self.assertEqual(test.bytes_pruned(), 1)
+            test.insert(0, b'abcd')
+            self.assertEqual(test.pop(), b'abcde')
+            self.assertEqual(test.fragments_pending(), 0)
+
+    def test_fragment_overhead(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(20, engine=engine, fragment_overhead=8)
+            test.insert(1, b'b')
+            test.insert(3, b'de')
+            self.assertEqual(test.fragments_pruned(), 0)
+            test.insert(10, b'k')
+            self.assertEqual(test.fragments_pruned(), 1)
+            self.assertEqual(test.bytes_pruned(), 1)
+            test.insert(6, b'ghi')
+            self.assertEqual(test.fragments_pruned(), 2)
+            self.assertEqual(test.bytes_pruned(), 4)
+            self.assertEqual(test.bytes_pending(), 3)
+
+    def test_sack_blocks(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(100, engine=engine)
+            self.assertEqual(test.sack_blocks(), [])
+            test.insert(10, b'k')
+            test.insert(2, b'cd')
+            test.insert(20, b'uv')
+            test.insert(6, b'g')
+            test.insert(4, b'e')
+            self.assertEqual(test.sack_blocks(), [(2, 5), (6, 7), (20, 22),
+                                                  (10, 11)])
+            self.assertEqual(test.sack_blocks(2), [(2, 5), (6, 7)])
+            test.insert(11, b'l')
+            self.assertEqual(test.sack_blocks(3), [(10, 12), (2, 5), (6, 7)])
+            test.insert(0, b'ab')
+            self.assertEqual(test.sack_blocks(), [(10, 12), (6, 7), (20, 22)])
+
+    def test_discard_past_eof(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(100, engine=engine)
+            test.insert(10, b'klmn')
+            test.insert(6, b'g')
+            test.insert(3, b'de', True)
+            self.assertEqual(test.bytes_pending(), 2)
+            self.assertEqual(test.fragments_pending(), 1)
+            test.insert(20, b'u')
+            test.insert(4, b'efgh')
+            self.assertEqual(test.bytes_pending(), 2)
+            self.assertEqual(test.sack_blocks(), [(3, 5)])
+            test.insert(0, b'abc')
+            self.assertEqual(test.pop(), b'abcde')
+            self.assertTrue(test.is_finished())
+
+    def test_discard_straddling_eof(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(100, engine=engine)
+            test.insert(2, b'c')
+            test.insert(3, b'defgh')
+            test.insert(4, b'e', True)
+            self.assertEqual(test.bytes_pending(), 3)
+            self.assertEqual(test.fragments_pending(), 1)
+            test.insert(0, b'ab')
+            self.assertEqual(test.pop(), b'abcde')
+            self.assertTrue(test.is_finished())
+
+    def test_discard_past_eof_in_batch(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(16, engine=engine)
+            test.insert_many([(2, b'cdJUNK', False), (4, b'', True)])
+            self.assertEqual(test.bytes_pending(), 2)
+            test.insert(0, b'ab')
+            self.assertTrue(test.is_closed())
+            self.assertEqual(test.pop(), b'abcd')
+
+    def test_window_engine_borrowing_storage(self):
+        test = Reassembler(4, storage=ChunkStorage, engine=WindowEngine)
+        test.insert(1, b'bc')
+        test.insert(0, b'a')
+        test.insert(3, b'd')
+        self.assertEqual(test.pop(1), b'a')
+        test.insert(4, b'e')
+        self.assertEqual(test.pop(), b'bcde')
+
+    def test_segment_engine_borrowing_storage(self):
+        # Pieces already point into immutable payloads: the stream keeps
+        # them as they are and only pop() copies.
+        test = Reassembler(8, storage=ChunkStorage, engine=SegmentEngine)
+        data = b'bcd'
+        test.insert(1, data)
+        test.insert(0, b'a')
+        views = test.peek_views()
+        self.assertEqual(len(views), 2)
+        self.assertIs(views[1].obj, data)
+        self.assertEqual(test.pop(), b'abcd')
+
+    def test_newer_bytes_win(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(32, engine=engine)
+            test.insert(2, b'cdef')
+            test.insert(4, b'E')
+            test.insert(2, b'C')
+            test.insert(1, b'BCD')
+            test.insert(10, b'kl')
+            test.insert(13, b'no')
+            test.insert(16, b'q')
+            test.insert(11, b'LMNOP')
+            test.insert(8, b'ijK')
+            test.insert(15, b'pQr')
+            self.assertEqual(test.fragments_pending(), 2)
+            self.assertEqual(test.bytes_pending(), 15)
+            test.insert(0, b'a')
+            test.insert(6, b'gh')
+            self.assertEqual(test.pop(), b'aBCDEfghijKLMNOpQr')
+
+    def test_reused_buffer(self):
+        for engine in (SegmentEngine, WindowEngine):
+            test = Reassembler(16, engine=engine)
+            buf = bytearray(3)
+            for idx, data in ((3, b'def'), (6, b'XYZ'), (0, b'abc')):
+                buf[:] = data
+                test.insert(idx, memoryview(buf))
+            buf.extend(b'grow')
+            self.assertEqual(test.pop(), b'abcdefXYZ')
+
+            buf = bytearray(b'bcdef')
+            test.insert_many([(10, buf, False), (13, b'efgh', False)])
+            buf[:] = b'XXXXX'
+            buf.clear()
+            test.insert(9, b'a')
+            self.assertEqual(test.pop(), b'abcdefgh')
+
+
+class TestReassemblerEngines(unittest.TestCase):
+
+    def test_segment_engine_tail(self):
+        test = SegmentEngine(64)
+        test.store(10, b'ab')
+        test.store(12, b'cd')
+        self.assertEqual(test.fragments(), [(10, 14)])
+        test.store(20, b'x')
+        self.assertEqual(test.fragments(), [(10, 14), (20, 21)])
+        test.store(0, b'0123456789')
+        self.assertEqual(test.fragments(), [(0, 14), (20, 21)])
+        self.assertEqual(test.bytes_pending(), 15)
+        pieces = test.flush(0)
+        self.assertEqual(len(pieces), 3)
+        self.assertEqual(b''.join(pieces), b'0123456789abcd')
+        self.assertEqual(test.fragments(), [(20, 21)])
+        self.assertEqual(test.bytes_pending(), 1)
+
+    def test_window_engine_compact(self):
+        test = WindowEngine(4)
+        test.store(0, b'ab')
+        self.assertEqual(b''.join(test.flush(0)), b'ab')
+        test.store(2, b'cde')
+        self.assertEqual(b''.join(test.flush(2)), b'cde')
+        # start is past the window size now, so the next store slides the
+        # buffer and the map back to the front.
+        test.store(7, b'hi')
+        self.assertEqual(test.fragments(), [(7, 9)])
+        self.assertEqual(test.fragment_at(8), (7, 9))
+        self.assertIsNone(test.fragment_at(6))
+        self.assertEqual(test.flush(5), [])
+        test.store(5, b'f')
+        self.assertEqual(test.fragments(), [(5, 6), (7, 9)])
+        self.assertEqual(test.fragments_pending(), 2)
+        test.store(6, b'g')
+        self.assertEqual(test.fragments_pending(), 1)
+        self.assertEqual(test.bytes_pending(), 4)
+        self.assertEqual(b''.join(test.flush(5)), b'fghi')
+        self.assertEqual(test.fragments(), [])
+        self.assertEqual(test.bytes_pending(), 0)
+
+    def test_incomplete_engine(self):
+
+        class NoPrune(SegmentEngine):
+            prune = Engine.prune
+
+        with self.assertRaises(TypeError):
+            Reassembler(8, engine=NoPrune)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,3 +1,4 @@
+import dataclasses
 import random
 import unittest
 
@@ -527,5 +528,46 @@ class TestReceiverSpecial(unittest.TestCase):
         self.assertTrue(test.is_finished())
 
 
+class TestReceiverSack(unittest.TestCase):
+
+    def test_sack(self):
+        test = Receiver(4000)
+        isn = random.getrandbits(32)
+        test.receive_sender_message(
+            SenderMessage(Wrap32(isn), True, False, b''))
+        self.assertEqual(test.receiver_message().sack, ())
+        test.receive_sender_message(
+            SenderMessage(Wrap32(isn + 3), False, False, b'cd'))
+        test.receive_sender_message(
+            SenderMessage(Wrap32(isn + 7), False, False, b'g'))
+        msg = test.receiver_message()
+        self.assertEqual(msg.ackno, Wrap32(isn + 1))
+        self.assertEqual(msg.sack, ((Wrap32(isn + 7), Wrap32(isn + 8)),
+                                    (Wrap32(isn + 3), Wrap32(isn + 5))))
+        test.receive_sender_message(
+            SenderMessage(Wrap32(isn + 1), False, False, b'ab'))
+        msg = test.receiver_message()
+        self.assertEqual(msg.ackno, Wrap32(isn + 5))
+        self.assertEqual(msg.sack, ((Wrap32(isn + 7), Wrap32(isn + 8)), ))
+
+
+class TestReceiverMessages(unittest.TestCase):
+
+    def test_syn_not_mutated(self):
+        test = Receiver(4000)
+        msg = SenderMessage(Wrap32(5), True, False, b'ab')
+        test.receive_sender_message(msg)
+        self.assertEqual(msg.seqno, Wrap32(5))
+        self.assertEqual(test.pop(), b'ab')
+        test.receive_sender_message(msg)
+        self.assertEqual(test.receiver_message().ackno, Wrap32(8))
+
+    def test_frozen(self):
+        msg = Receiver(4000).receiver_message()
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            msg.winsize = 1
+        self.assertFalse(hasattr(msg, '__dict__'))
+
+
 if __name__ == '__main__':
     unittest.main()
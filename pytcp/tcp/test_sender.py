@@ -1144,5 +1144,28 @@ class TestSenderExtra(unittest.TestCase):
         self.assertEqual(len(msg.payload), 0)
 
 
+class TestSenderReuseMessages(unittest.TestCase):
+
+    def test_reuse(self):
+        test = Sender(isn=isn, reuse_messages=True)
+        test.fill()
+        msg = test.optional_sender_message()
+        self.assertTrue(msg.syn)
+        self.assertEqual(msg.seqno, Wrap32(isn))
+        test.receive_receiver_message(ReceiverMessage(Wrap32(isn + 1), win))
+        test.push(b'abc')
+        test.close()
+        test.fill()
+        self.assertIs(test.optional_sender_message(), msg)
+        self.assertFalse(msg.syn)
+        self.assertTrue(msg.fin)
+        self.assertEqual(msg.seqno, Wrap32(isn + 1))
+        self.assertEqual(msg.payload, b'abc')
+        self.assertIs(test.empty_sender_message(), msg)
+        self.assertFalse(msg.fin)
+        self.assertEqual(msg.seqno, Wrap32(isn + 5))
+        self.assertEqual(msg.payload, b'')
+
+
 if __name__ == '__main__':
     unittest.main()
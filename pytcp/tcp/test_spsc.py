@@ -0,0 +1,78 @@
+import functools
+import random
+import threading
+import time
+import unittest
+
+from .spsc import SPSCStream
+from .storage import ChunkStorage, MmapStorage
+
+
+class TestSPSCStream(unittest.TestCase):
+
+    def test_threads(self):
+        test = SPSCStream(97)
+        data = random.randbytes(100000)
+        output = bytearray()
+
+        def reader():
+            buf = bytearray(61)
+            while not test.is_finished():
+                n = test.read_into(buf)
+                output.extend(buf[:n])
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for i in range(0, len(data), 1000):
+            self.assertEqual(test.write(data[i:i + 1000]), 1000)
+        test.close()
+        thread.join()
+        self.assertEqual(output, data)
+
+    def test_pop_chunks_threads(self):
+        test = SPSCStream(97)
+        data = random.randbytes(20000)
+        output = bytearray()
+
+        def reader():
+            while not test.is_finished():
+                chunks = test.pop_chunks()
+                # Give the writer time to refill the ring before reading.
+                time.sleep(0.0001)
+                for chunk in chunks:
+                    output.extend(chunk)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for i in range(0, len(data), 1000):
+            self.assertEqual(test.write(data[i:i + 1000]), 1000)
+        test.close()
+        thread.join()
+        self.assertEqual(output, data)
+
+    def test_pop_chunks_copy(self):
+        test = SPSCStream(4)
+        test.push(b'abcd')
+        chunks = test.pop_chunks()
+        test.push(b'WXYZ')
+        self.assertEqual(b''.join(chunks), b'abcd')
+
+    def test_storage(self):
+        test = SPSCStream(4, storage=functools.partial(MmapStorage, release=1))
+        self.assertEqual(test.write(b'abcdef', timeout=0.01), 4)
+        self.assertEqual(test.read(), b'abcd')
+        with self.assertRaises(TypeError):
+            SPSCStream(4, storage=ChunkStorage)
+
+    def test_timeout(self):
+        test = SPSCStream(2)
+        self.assertEqual(test.read(timeout=0.01), b'')
+        self.assertEqual(test.write(b'abc', timeout=0.01), 2)
+        self.assertEqual(test.read(timeout=0.01), b'ab')
+        test.close()
+        self.assertEqual(test.read(), b'')
+        self.assertTrue(test.is_finished())
+
+
+if __name__ == '__main__':
+    unittest.main()
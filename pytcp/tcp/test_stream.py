@@ -1,5 +1,12 @@
+import functools
+import mmap
+import os
+import random
+import tempfile
 import unittest
 
+from .storage import (BytesStorage, ChunkStorage, MmapStorage, RingStorage,
+                      Storage)
 from .stream import Stream
 
 
@@ -309,5 +316,173 @@ class TestStreamTwoWrites(unittest.TestCase):
         self.assertEqual(test.bytes_buffered(), 0)
 
 
+class TestStreamStorage(unittest.TestCase):
+
+    def test_ring_wrap(self):
+        test = Stream(4, storage=RingStorage)
+        test.push(b'abc')
+        self.assertEqual(test.pop(2), b'ab')
+        test.push(b'def')
+        self.assertEqual(test.cap(), 0)
+        self.assertEqual(test.peek(), b'cdef')
+        self.assertEqual(test.pop(3), b'cde')
+        test.push(b'ghi')
+        self.assertEqual(test.pop(), b'fghi')
+        self.assertEqual(test.bytes_pushed(), 9)
+        self.assertEqual(test.bytes_popped(), 9)
+
+    def test_peek_views(self):
+        test = Stream(4, storage=RingStorage)
+        test.push(b'abc')
+        test.pop(2)
+        test.push(b'def')
+        self.assertEqual(test.peek_view(), b'cd')
+        self.assertEqual(test.peek_view(1), b'c')
+        self.assertEqual([bytes(v) for v in test.peek_views()], [b'cd', b'ef'])
+        self.assertEqual([bytes(v) for v in test.peek_views(3)], [b'cd', b'e'])
+        self.assertEqual(test.skip(3), 3)
+        self.assertEqual(test.peek_view(), b'f')
+        self.assertEqual(test.bytes_popped(), 5)
+        test.pop()
+        self.assertEqual(test.peek_view(), b'')
+        self.assertEqual(test.peek_views(), [])
+
+    def test_chunks_by_reference(self):
+        test = Stream(10, storage=ChunkStorage)
+        buf = b'abcd'
+        test.push(buf)
+        test.push(bytearray(b'efgh'))
+        test.push(memoryview(b'ijkl'))
+        self.assertEqual(test.cap(), 0)
+        self.assertEqual(test.bytes_pushed(), 10)
+        self.assertIs(test.pop(4), buf)
+        self.assertEqual(test.pop(3), b'efg')
+        self.assertEqual([bytes(v) for v in test.peek_views()], [b'h', b'ij'])
+        self.assertEqual(test.pop(), b'hij')
+        self.assertEqual(test.bytes_buffered(), 0)
+
+    def test_pop_into(self):
+        for storage in (BytesStorage, RingStorage, ChunkStorage):
+            test = Stream(4, storage=storage)
+            test.push(b'abc')
+            test.pop(2)
+            test.push(b'def')
+            buf = bytearray(3)
+            self.assertEqual(test.pop_into(buf), 3)
+            self.assertEqual(buf, b'cde')
+            self.assertEqual(test.pop_into(buf), 1)
+            self.assertEqual(buf, b'fde')
+            self.assertEqual(test.pop_into(buf), 0)
+            self.assertEqual(test.bytes_popped(), 6)
+
+    def test_push_many_pop_chunks(self):
+        for storage in (BytesStorage, RingStorage, ChunkStorage):
+            test = Stream(8, storage=storage)
+            self.assertEqual(test.push_many([b'ab', b'', b'cd']), 4)
+            self.assertEqual(test.pop(1), b'a')
+            self.assertEqual(test.push_many(iter([b'efg', b'hij', b'k'])), 5)
+            self.assertEqual(test.cap(), 0)
+            self.assertEqual(test.bytes_pushed(), 9)
+            self.assertEqual(test.push_many([b'k']), 0)
+            self.assertEqual(b''.join(test.pop_chunks(5)), b'bcdef')
+            self.assertEqual(test.bytes_popped(), 6)
+            self.assertEqual(b''.join(test.pop_chunks()), b'ghi')
+            self.assertEqual(test.pop_chunks(), [])
+            self.assertTrue(test.bytes_buffered() == 0)
+
+    def test_mmap(self):
+        cap = 3 * mmap.PAGESIZE + 100
+        with tempfile.TemporaryDirectory() as tmp:
+            for storage in (functools.partial(MmapStorage,
+                                              release=mmap.PAGESIZE),
+                            functools.partial(MmapStorage, release=1),
+                            functools.partial(MmapStorage, release=3 * cap),
+                            functools.partial(MmapStorage,
+                                              path=os.path.join(tmp, 'ring'),
+                                              release=mmap.PAGESIZE)):
+                ref = Stream(cap, storage=BytesStorage)
+                test = Stream(cap, storage=storage)
+                for i in range(500):
+                    buf = random.randbytes(random.randint(0, 2 * cap))
+                    self.assertEqual(test.push(buf), ref.push(buf))
+                    n = random.randint(0, 2 * cap)
+                    self.assertEqual(test.pop(n), ref.pop(n))
+
+    @unittest.skipUnless(hasattr(mmap, 'MADV_DONTNEED'), 'no madvise')
+    def test_mmap_release(self):
+        cap = 8 * mmap.PAGESIZE
+        storage = MmapStorage(cap, release=mmap.PAGESIZE)
+        storage.push(b'\xff' * cap)
+        storage.skip(cap - 10)
+        storage.push(b'\xff' * (2 * mmap.PAGESIZE))
+        # Released pages of a private mapping read back as zeros; the last
+        # page of the ring still holds unread bytes.
+        self.assertEqual(
+            storage.ring_bytes(2 * mmap.PAGESIZE, 7 * mmap.PAGESIZE),
+            bytes(5 * mmap.PAGESIZE))
+        self.assertEqual(storage.ring_bytes(0, 2 * mmap.PAGESIZE),
+                         b'\xff' * (2 * mmap.PAGESIZE))
+        self.assertEqual(b''.join(storage.views(len(storage))),
+                         b'\xff' * (2 * mmap.PAGESIZE + 10))
+
+    def test_mmap_close(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ring')
+            with MmapStorage(16, path=path) as storage:
+                storage.push(b'cat')
+                views = storage.views(3)
+                self.assertEqual(views[0], b'cat')
+                with self.assertRaises(BufferError):
+                    storage.close()
+                views[0].release()
+            with self.assertRaises(ValueError):
+                storage.views(3)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(3), b'cat')
+
+    def test_mmap_large_cap(self):
+        test = Stream(1 << 30, storage=MmapStorage)
+        test.push(b'cat')
+        self.assertEqual(test.cap(), (1 << 30) - 3)
+        self.assertEqual(test.peek_view(), b'cat')
+        self.assertEqual(test.pop(), b'cat')
+
+    def test_incomplete_storage(self):
+
+        class NoSkip(BytesStorage):
+            skip = Storage.skip
+
+        with self.assertRaises(TypeError):
+            Stream(4, storage=NoSkip)
+
+    def test_ring_zero_cap(self):
+        test = Stream(0, storage=RingStorage)
+        test.push(b'cat')
+        self.assertEqual(test.bytes_pushed(), 0)
+        self.assertEqual(test.pop(), b'')
+
+    def test_random(self):
+        for storage in (RingStorage, ChunkStorage):
+            ref = Stream(97, storage=BytesStorage)
+            test = Stream(97, storage=storage)
+            for i in range(2000):
+                if random.getrandbits(1):
+                    buf = random.randbytes(random.randint(0, 40))
+                    ref.push(buf)
+                    test.push(buf)
+                else:
+                    n = random.randint(0, 40)
+                    self.assertEqual(b''.join(test.peek_views(n)),
+                                     ref.peek_view(n))
+                    if random.getrandbits(1):
+                        buf = bytearray(n)
+                        m = test.pop_into(memoryview(buf))
+                        self.assertEqual(buf[:m], ref.pop(n))
+                    else:
+                        self.assertEqual(test.pop(n), ref.pop(n))
+                self.assertEqual(test.cap(), ref.cap())
+                self.assertEqual(test.peek(), ref.peek())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,82 @@
+import random
+import unittest
+from typing import Callable
+
+from .reassembler import Engine, SegmentEngine, WindowEngine
+from .stress import (LegacyReassembler, ReferenceReassembler, stress_replay,
+                     stress_test, stress_workload)
+
+ENGINES: dict[str, Callable[[int], Engine]] = {
+    'segment': SegmentEngine,
+    'window': WindowEngine,
+}
+
+
+class TestStress(unittest.TestCase):
+
+    def test_reference(self):
+        ref = ReferenceReassembler(8, 16)
+        ref.insert(2, b'cdef', False)
+        self.assertEqual(
+            (ref.bytes_pushed(), ref.bytes_pending(), ref.fragments_pending()),
+            (0, 4, 1))
+        ref.insert(0, b'abCDEFGHIJKL', True)
+        self.assertEqual((ref.bytes_pushed(), ref.bytes_pending()), (8, 0))
+        self.assertFalse(ref.is_closed())
+        self.assertEqual(ref.pop(16), b'abCDEFGH')
+        ref.insert_many([(10, b'kl', False), (8, b'ij', False)])
+        self.assertTrue(ref.is_closed())
+        self.assertEqual(ref.pop(16), b'ijkl')
+        self.assertTrue(ref.is_finished())
+
+    def test_reference_prune(self):
+        ref = ReferenceReassembler(16, 32, max_fragments=2)
+        ref.insert(2, b'c', False)
+        ref.insert(8, b'i', False)
+        ref.insert(4, b'e', False)
+        self.assertEqual((ref.bytes_pending(), ref.fragments_pending()),
+                         (2, 2))
+        self.assertEqual(ref.bytes_pruned(), 1)
+        self.assertEqual(ref.present.find(1), 2)
+        self.assertEqual(ref.present.rfind(1), 4)
+
+    def test_legacy(self):
+        ref = LegacyReassembler(8)
+        ref.insert(2, b'cdef')
+        ref.insert(4, b'E')
+        self.assertEqual((ref.bytes_pushed(), ref.bytes_pending()), (0, 4))
+        ref.insert(0, b'ab')
+        self.assertEqual(ref.pop(), b'abcdEf')
+        ref.insert(6, b'gh', True)
+        self.assertTrue(ref.is_closed())
+        self.assertEqual(ref.pop(), b'gh')
+
+    def test_legacy_workload(self):
+        rd = random.Random(1)
+        workload = stress_workload(rd, 1000, 64, legacy=True)
+        self.assertEqual(workload.oracle, 'legacy')
+        self.assertTrue(all(len(step[0]) == 1 for step in workload.steps))
+        self.assertTrue(all(step[4] is None for step in workload.steps))
+        self.assertTrue(workload.steps[-1][-1])
+        for engine in ENGINES.values():
+            stress_replay(engine, workload)
+
+    def test_workload(self):
+        rd = random.Random(1)
+        workload = stress_workload(rd, 1000, 64)
+        self.assertEqual(len(workload.data), 1000)
+        segs = [seg for step in workload.steps for seg in step[0]]
+        self.assertTrue(any(eof for _, _, eof in segs))
+        self.assertTrue(any(len(step[0]) > 1 for step in workload.steps))
+        self.assertTrue(workload.steps[-1][-1])
+
+    def test_engines(self):
+        for capacity in (1, 17, 1500):
+            totals = stress_test(ENGINES, 20 * capacity, capacity, 1370, 3000)
+            for inserts, nbytes, _ in totals.values():
+                self.assertGreaterEqual(inserts, 3000)
+                self.assertGreater(nbytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import random
+import struct
+import unittest
+
+from .messages import ReceiverMessage, SenderMessage
+from .receiver import Receiver
+from .sender import Sender
+from .wire import (HEADER_LEN, decode, decode_batch, encode, encode_batch,
+                   encode_into)
+from .wrap32 import Wrap32
+
+
+class TestWire(unittest.TestCase):
+
+    def test_layout(self):
+        buf = encode(SenderMessage(Wrap32(0x01020304), True, False, b'ab'),
+                     ReceiverMessage(Wrap32(0x05060708), 0x090a), 80, 443)
+        self.assertEqual(
+            bytes(buf), b'\x00\x50\x01\xbb\x01\x02\x03\x04\x05\x06\x07\x08'
+            b'\x50\x12\x09\x0a\x00\x00\x00\x00ab')
+
+    def test_roundtrip(self):
+        for i in range(1000):
+            smsg = SenderMessage(Wrap32(random.getrandbits(32)),
+                                 random.random() < 0.5,
+                                 random.random() < 0.5,
+                                 random.randbytes(random.randint(0, 100)))
+            ackno = Wrap32(random.getrandbits(32)) \
+                if random.random() < 0.5 else None
+            rmsg = ReceiverMessage(ackno, random.getrandbits(16))
+            self.assertEqual(decode(encode(smsg, rmsg)), (smsg, rmsg))
+
+    def test_encode_into(self):
+        buf = bytearray(100)
+        smsg = SenderMessage(Wrap32(7), False, True, b'xyz')
+        rmsg = ReceiverMessage(None, 1 << 20)
+        n = encode_into(buf, 10, smsg, rmsg)
+        self.assertEqual(n, HEADER_LEN + 3)
+        self.assertEqual(buf[:10], bytes(10))
+        smsg2, rmsg2 = decode(buf, 10, n)
+        self.assertEqual(smsg2, smsg)
+        self.assertEqual(rmsg2, ReceiverMessage(None, 0xffff))
+
+    def test_payload_view(self):
+        buf = encode(SenderMessage(Wrap32(7), False, False, b'xyz'),
+                     ReceiverMessage(None, 0))
+        smsg, _ = decode(buf)
+        self.assertIsInstance(smsg.payload, memoryview)
+        buf[HEADER_LEN] = ord('X')
+        self.assertEqual(smsg.payload, b'Xyz')
+
+    def test_invalid(self):
+        buf = encode(SenderMessage(Wrap32(7), False, False, b''),
+                     ReceiverMessage(None, 0))
+        with self.assertRaises(struct.error):
+            decode(buf[:HEADER_LEN - 1])
+        buf[12] = 0x40
+        with self.assertRaises(ValueError):
+            decode(buf)
+        buf[12] = 0x60
+        with self.assertRaises(ValueError):
+            decode(buf)
+
+    def test_batch(self):
+        rmsg = ReceiverMessage(Wrap32(9), 1000)
+        smsgs = [
+            SenderMessage(Wrap32(i), i == 0, i == 9, random.randbytes(i * 10))
+            for i in range(10)
+        ]
+        buf, offsets = encode_batch(smsgs, rmsg)
+        self.assertEqual(len(buf), 10 * HEADER_LEN + 450)
+        self.assertEqual(offsets[0], 0)
+        self.assertEqual(offsets[-1], len(buf))
+        for i, smsg in enumerate(smsgs):
+            self.assertEqual(buf[offsets[i]:offsets[i + 1]],
+                             encode(smsg, rmsg))
+        self.assertEqual(decode_batch(buf, offsets),
+                         [(smsg, rmsg) for smsg in smsgs])
+
+    def test_batch_reuse_buffer(self):
+        rmsg = ReceiverMessage(None, 10)
+        buf = bytearray(1000)
+        smsgs = [SenderMessage(Wrap32(1), False, False, b'abc')]
+        out, offsets = encode_batch(smsgs, rmsg, buf)
+        self.assertIs(out, buf)
+        self.assertEqual(offsets, [0, HEADER_LEN + 3])
+        out, offsets = encode_batch(smsgs * 100, rmsg, buf)
+        self.assertIsNot(out, buf)
+        self.assertEqual(len(decode_batch(out, offsets)), 100)
+        self.assertEqual(encode_batch([], rmsg), (bytearray(), [0]))
+
+    def test_sender_to_receiver(self):
+        data = random.randbytes(10000)
+        sender = Sender(len(data), isn=random.getrandbits(32), mss=100)
+        receiver = Receiver(len(data))
+        sender.push(data)
+        sender.close()
+        # One receive buffer for every segment, delivered out of order: the
+        # receiver has to copy what it keeps pending.
+        wire = bytearray(HEADER_LEN + 100)
+        output = bytearray()
+        while not receiver.is_finished():
+            sender.fill()
+            rmsg = receiver.receiver_message()
+            msgs = []
+            msg = sender.optional_sender_message()
+            while msg is not None:
+                msgs.append(msg)
+                msg = sender.optional_sender_message()
+            random.shuffle(msgs)
+            for msg in msgs:
+                smsg, _ = decode(wire, 0, encode_into(wire, 0, msg, rmsg))
+                receiver.receive_sender_message(smsg)
+            n = encode_into(wire, 0, sender.empty_sender_message(),
+                            receiver.receiver_message())
+            _, rmsg = decode(wire, 0, n)
+            sender.receive_receiver_message(rmsg)
+            output += receiver.pop()
+        self.assertEqual(output, data)
+
+
+if __name__ == '__main__':
+    unittest.main()
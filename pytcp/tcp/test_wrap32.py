@@ -1,7 +1,14 @@
+import importlib.util
+import os
 import random
+import subprocess
+import sys
 import unittest
 
-from .wrap32 import Wrap32
+from .wrap32 import Wrap32, unwrap_array, wrap_array
+
+if importlib.util.find_spec('numpy') is not None:
+    import numpy as np
 
 
 class TestWrap32(unittest.TestCase):
@@ -16,6 +23,21 @@ class TestWrap32(unittest.TestCase):
             self.assertEqual(Wrap32(n) == Wrap32(m), n == m)
             self.assertEqual(Wrap32(n) != Wrap32(m), n != m)
 
+    def test_value(self):
+        self.assertEqual(Wrap32(5), 5)
+        self.assertNotEqual(Wrap32(5), 5 + (1 << 32))
+        self.assertNotEqual(Wrap32(5), None)
+        self.assertEqual(hash(Wrap32(5)), hash(Wrap32(5 + (1 << 32))))
+        self.assertEqual(hash(Wrap32(5)), hash(5))
+        self.assertEqual(len({Wrap32(1), Wrap32(1), Wrap32(2)}), 2)
+        self.assertIn(1, {Wrap32(1)})
+        with self.assertRaises(AttributeError):
+            setattr(Wrap32(5), 'other', 1)
+        w = Wrap32(5)
+        with self.assertRaises(AttributeError):
+            setattr(w, 'raw', 7)
+        self.assertEqual(w.raw, 5)
+
     def test_wrap(self):
         self.assertEqual(Wrap32(0).wrap(3 * (1 << 32)), Wrap32(0))
         self.assertEqual(Wrap32(15).wrap(3 * (1 << 32) + 17), Wrap32(32))
@@ -40,6 +62,9 @@ class TestWrap32(unittest.TestCase):
 
     def __test_roundtrip(self, isn: Wrap32, n: int, checkpoint: int):
         self.assertEqual(isn.unwrap(isn.wrap(n), checkpoint), n)
+        self.assertEqual(
+            Wrap32.unwrap_raw(isn.raw,
+                              isn.wrap(n).raw, checkpoint), n)
 
     def test_roundtrip(self):
         big_offset = (1 << 31) - 1
@@ -56,6 +81,61 @@ class TestWrap32(unittest.TestCase):
             self.__test_roundtrip(isn, n + big_offset, n)
             self.__test_roundtrip(isn, n - big_offset, n)
 
+    def test_lazy_import(self):
+        # numpy is only for the array helpers: importing tcp must not load it.
+        code = 'import sys, tcp.receiver, tcp.sender; ' \
+            'print("numpy" in sys.modules)'
+        out = subprocess.run([sys.executable, '-c', code],
+                             capture_output=True,
+                             check=True,
+                             text=True,
+                             cwd=os.path.dirname(os.path.dirname(__file__)))
+        self.assertEqual(out.stdout.strip(), 'False')
+
+
+@unittest.skipIf(
+    importlib.util.find_spec('numpy') is None, 'numpy is not installed')
+class TestWrap32Array(unittest.TestCase):
+
+    def __test_unwrap(self, isn: Wrap32, raws: list[int], checkpoint: int):
+        expected, n = [], checkpoint
+        for raw in raws:
+            n = isn.unwrap(Wrap32(raw), n)
+            expected.append(n)
+        got = unwrap_array(isn, np.array(raws, dtype=np.uint32), checkpoint)
+        self.assertEqual(got.tolist(), expected)
+
+    def test_wrap(self):
+        isn = Wrap32(0xfffffff0)
+        ns = [0, 15, 16, 3 * (1 << 32) + 17, (1 << 62) + 5]
+        self.assertEqual(
+            wrap_array(isn, np.array(ns, dtype=np.uint64)).tolist(),
+            [isn.wrap(n).raw for n in ns])
+        self.assertEqual(wrap_array(isn, []).dtype, np.uint32)
+
+    def test_unwrap(self):
+        MAXI, MAXi = 0xffffffff, 0x7fffffff
+        self.assertEqual(unwrap_array(Wrap32(0), [], 5).tolist(), [])
+        self.__test_unwrap(Wrap32(0), [1, MAXI, 0, MAXi, 0, MAXI], 0)
+        self.__test_unwrap(Wrap32(16), [15, 16, 15, 14], 0)
+        self.__test_unwrap(Wrap32(MAXi), [0, MAXI, MAXi, 0], 0)
+        self.__test_unwrap(Wrap32(0), [MAXI - 1, 1 << 31, 0, 1 << 31], 1 << 33)
+
+    def test_unwrap_random(self):
+        for i in range(200):
+            isn = Wrap32(random.getrandbits(32))
+            checkpoint = random.choice([0, 1, random.getrandbits(40)])
+            raws = [
+                random.getrandbits(32) for _ in range(random.randint(1, 50))
+            ]
+            self.__test_unwrap(isn, raws, checkpoint)
+            n = checkpoint
+            raws = []
+            for _ in range(1000):
+                n = max(0, n + random.randint(-(1 << 20), 1 << 24))
+                raws.append(isn.wrap(n).raw)
+            self.__test_unwrap(isn, raws, checkpoint)
+
 
 if __name__ == '__main__':
     unittest.main()
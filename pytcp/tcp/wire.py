@@ -0,0 +1,110 @@
+import struct
+from typing import Optional, Sequence, Union
+
+from .messages import ReceiverMessage, SenderMessage
+from .storage import Buffer
+from .wrap32 import Wrap32
+
+# Source port, destination port, seqno, ackno, data offset, flags, window,
+# checksum and urgent pointer of a TCP header without options.
+HEADER = struct.Struct('!HHIIBBHHH')
+HEADER_LEN = HEADER.size
+
+FIN = 0x01
+SYN = 0x02
+ACK = 0x10
+
+DATA_OFFSET = HEADER_LEN // 4 << 4
+
+
+def encoded_len(smsg: SenderMessage) -> int:
+    return HEADER_LEN + len(smsg.payload)
+
+
+def encode_into(buf: Union[bytearray, memoryview],
+                offset: int,
+                smsg: SenderMessage,
+                rmsg: ReceiverMessage,
+                sport: int = 0,
+                dport: int = 0) -> int:
+    flags = (SYN if smsg.syn else 0) | (FIN if smsg.fin else 0)
+    ackno = 0
+    if rmsg.ackno is not None:
+        flags |= ACK
+        ackno = rmsg.ackno.raw
+    HEADER.pack_into(buf, offset, sport, dport, smsg.seqno.raw, ackno,
+                     DATA_OFFSET, flags, min(rmsg.winsize, 0xffff), 0, 0)
+    start = offset + HEADER_LEN
+    end = start + len(smsg.payload)
+    buf[start:end] = smsg.payload
+    return end - offset
+
+
+def encode(smsg: SenderMessage,
+           rmsg: ReceiverMessage,
+           sport: int = 0,
+           dport: int = 0) -> bytearray:
+    buf = bytearray(encoded_len(smsg))
+    encode_into(buf, 0, smsg, rmsg, sport, dport)
+    return buf
+
+
+def decode(buf: Buffer,
+           offset: int = 0,
+           length: int = -1) -> tuple[SenderMessage, ReceiverMessage]:
+    # The payload is a view into buf. Receiver copies what it keeps pending,
+    # so buf can be reused once the message has been received; anything else
+    # holding on to the message must copy the payload first.
+    view = memoryview(buf)
+    return _decode(view, offset, len(view) if length < 0 else offset + length)
+
+
+def _decode(view: memoryview, offset: int,
+            end: int) -> tuple[SenderMessage, ReceiverMessage]:
+    _, _, seqno, ackno, data_offset, flags, winsize, _, _ = \
+        HEADER.unpack_from(view, offset)
+    header_len = (data_offset >> 4) * 4
+    if header_len < HEADER_LEN or offset + header_len > end:
+        raise ValueError(f'invalid TCP data offset {header_len}')
+    smsg = SenderMessage(Wrap32(seqno), bool(flags & SYN), bool(flags & FIN),
+                         view[offset + header_len:end])
+    rmsg = ReceiverMessage(Wrap32(ackno) if flags & ACK else None, winsize)
+    return smsg, rmsg
+
+
+def encode_batch(smsgs: Sequence[SenderMessage],
+                 rmsg: ReceiverMessage,
+                 buf: Optional[bytearray] = None,
+                 sport: int = 0,
+                 dport: int = 0) -> tuple[bytearray, list[int]]:
+    # Message i ends up in buf[offsets[i]:offsets[i + 1]]. buf is reused when
+    # it is large enough. The messages must be distinct objects, so drain a
+    # Sender with reuse_messages one message at a time instead.
+    total = HEADER_LEN * len(smsgs) + sum(len(m.payload) for m in smsgs)
+    if buf is None or len(buf) < total:
+        buf = bytearray(total)
+    ackno = 0 if rmsg.ackno is None else rmsg.ackno.raw
+    ack = 0 if rmsg.ackno is None else ACK
+    winsize = min(rmsg.winsize, 0xffff)
+    pack_into = HEADER.pack_into
+    offsets = [0]
+    pos = 0
+    for smsg in smsgs:
+        flags = ack | (SYN if smsg.syn else 0) | (FIN if smsg.fin else 0)
+        pack_into(buf, pos, sport, dport, smsg.seqno.raw, ackno, DATA_OFFSET,
+                  flags, winsize, 0, 0)
+        start = pos + HEADER_LEN
+        pos = start + len(smsg.payload)
+        buf[start:pos] = smsg.payload
+        offsets.append(pos)
+    return buf, offsets
+
+
+def decode_batch(
+        buf: Buffer,
+        offsets: Sequence[int]) -> list[tuple[SenderMessage, ReceiverMessage]]:
+    view = memoryview(buf)
+    return [
+        _decode(view, offsets[i], offsets[i + 1])
+        for i in range(len(offsets) - 1)
+    ]
@@ -1,34 +1,99 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MASK32 = 0xffffffff
+MASK64_HIGH32 = 0xffffffff00000000
+ATOMIC_HIGH32 = 0x100000000
+
+
 class Wrap32:
-    raw: int
+    # Immutable value type: raw is read-only, so instances are safe to hash.
+    __slots__ = ('__raw', )
 
-    MASK32 = 0xffffffff
-    MASK64_HIGH32 = 0xffffffff00000000
-    ATOMIC_HIGH32 = 0x100000000
+    __raw: int
+
+    MASK32 = MASK32
+    MASK64_HIGH32 = MASK64_HIGH32
+    ATOMIC_HIGH32 = ATOMIC_HIGH32
 
     def __init__(self, raw: int):
-        self.raw = raw & self.MASK32
+        self.__raw = raw & MASK32
+
+    @property
+    def raw(self) -> int:
+        return self.__raw
+
+    def __repr__(self) -> str:
+        return f'Wrap32({self.__raw})'
 
     def __eq__(self, other) -> bool:
+        # Only ints in 32-bit range compare equal, as hash() must agree.
         if isinstance(other, Wrap32):
-            return self.raw == other.raw
-        return self.raw == Wrap32(other).raw
+            return self.__raw == other.__raw
+        if isinstance(other, int):
+            return self.__raw == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.__raw)
 
-    def __add__(self, other):
+    def __add__(self, other) -> 'Wrap32':
         if isinstance(other, Wrap32):
-            return Wrap32(self.raw + other.raw)
-        return Wrap32(self.raw + other)
+            return Wrap32(self.__raw + other.__raw)
+        return Wrap32(self.__raw + other)
 
     def wrap(self, n: int) -> 'Wrap32':
-        return Wrap32(self.raw + n)
+        return Wrap32(self.__raw + n)
 
     def unwrap(self, w: 'Wrap32', checkpoint: int) -> int:
-        n = (w.raw - self.raw) & self.MASK32
-        cl = checkpoint & self.MASK32
-        ch = checkpoint & self.MASK64_HIGH32
+        return Wrap32.unwrap_raw(self.__raw, w.__raw, checkpoint)
+
+    @staticmethod
+    def unwrap_raw(isn_raw: int, raw: int, checkpoint: int) -> int:
+        n = (raw - isn_raw) & MASK32
+        cl = checkpoint & MASK32
+        ch = checkpoint & MASK64_HIGH32
         if n == cl:
             return ch + n
-        if (n - cl) & self.MASK32 < (cl - n) & self.MASK32:
-            return ch + n if n > cl else ch + n + self.ATOMIC_HIGH32
+        if (n - cl) & MASK32 < (cl - n) & MASK32:
+            return ch + n if n > cl else ch + n + ATOMIC_HIGH32
         else:
             return ch + n if n < cl else \
-                (n if ch == 0 else ch + n - self.ATOMIC_HIGH32)
+                (n if ch == 0 else ch + n - ATOMIC_HIGH32)
+
+
+def _numpy(caller: str):
+    # numpy is only loaded by the array helpers, so that importing tcp does
+    # not pay for it.
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(f'{caller} requires numpy') from e
+    return numpy
+
+
+def wrap_array(isn: Wrap32, ns) -> 'np.ndarray':
+    np = _numpy('wrap_array')
+    ns = np.asarray(ns, dtype=np.uint64)
+    return ((ns + np.uint64(isn.raw)) & np.uint64(MASK32)).astype(np.uint32)
+
+
+def unwrap_array(isn: Wrap32, raws, checkpoint: int) -> 'np.ndarray':
+    # Unwrap each seqno against the previous result, starting from
+    # checkpoint, just like calling Wrap32.unwrap in a loop.
+    np = _numpy('unwrap_array')
+    raws = np.asarray(raws, dtype=np.uint32)
+    if len(raws) == 0:
+        return np.empty(0, dtype=np.int64)
+    prev = np.empty_like(raws)
+    prev[0] = (isn.raw + checkpoint) & MASK32
+    prev[1:] = raws[:-1]
+    # Nearest rule as a signed 32-bit step; a tie steps backward.
+    steps = (raws - prev).view(np.int32).astype(np.int64)
+    offsets = np.cumsum(steps) + checkpoint
+    # A step below zero goes forward a full turn instead, which shifts
+    # every later offset as well.
+    turns = np.maximum.accumulate(np.maximum(-(offsets >> 32), 0))
+    return offsets + (turns << 32)